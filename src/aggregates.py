@@ -0,0 +1,205 @@
+import argparse
+from db_connection import get_db_connection
+from query_cache import bump_data_version
+from sql_utils import placeholders
+
+# Summary tables read by query_3 and query_5, plus Actors.movie_count read by query_2. They are
+# kept current by the ingest (AggregateMaintainer) and can be rebuilt from the base tables at any time.
+AGGREGATE_TABLES = {
+    'Genre_Stats': """
+        CREATE TABLE IF NOT EXISTS Genre_Stats (
+            genre_id INT NOT NULL PRIMARY KEY,
+            movie_count INT NOT NULL,
+            sum_rating DOUBLE NOT NULL,
+            INDEX (movie_count),
+            FOREIGN KEY (genre_id) REFERENCES Genres(genre_id) ON DELETE CASCADE
+        )
+    """,
+    'Actor_Genre_Counts': """
+        CREATE TABLE IF NOT EXISTS Actor_Genre_Counts (
+            actor_id INT NOT NULL PRIMARY KEY,
+            distinct_genres INT NOT NULL,
+            INDEX (distinct_genres),
+            FOREIGN KEY (actor_id) REFERENCES Actors(actor_id) ON DELETE CASCADE
+        )
+    """,
+}
+
+def create_tables(cursor):
+    for sql in AGGREGATE_TABLES.values():
+        cursor.execute(sql)
+
+def add_genre_stats(cursor, new_movie_ids):
+    """Add the genre counts and ratings of movies that were just inserted for the first time."""
+    if not new_movie_ids:
+        return
+    ids = list(new_movie_ids)
+    cursor.execute(f"""
+        INSERT INTO Genre_Stats (genre_id, movie_count, sum_rating)
+        SELECT MG.genre_id, COUNT(*), COALESCE(SUM(M.vote_average), 0)
+        FROM Movie_Genres MG
+        JOIN Movies M ON MG.movie_id = M.movie_id
+        WHERE MG.movie_id IN ({placeholders(ids)})
+        GROUP BY MG.genre_id
+        ON DUPLICATE KEY UPDATE
+            movie_count = movie_count + VALUES(movie_count),
+            sum_rating = sum_rating + VALUES(sum_rating)
+    """, ids)
+
+def add_genre_links(cursor, links):
+    """Add the genre counts and ratings of (movie_id, genre_id) Movie_Genres rows that were just inserted."""
+    if not links:
+        return
+    pairs = sorted(links)
+    cursor.execute(f"""
+        INSERT INTO Genre_Stats (genre_id, movie_count, sum_rating)
+        SELECT MG.genre_id, COUNT(*), COALESCE(SUM(M.vote_average), 0)
+        FROM Movie_Genres MG
+        JOIN Movies M ON MG.movie_id = M.movie_id
+        WHERE (MG.movie_id, MG.genre_id) IN ({", ".join(["(%s, %s)"] * len(pairs))})
+        GROUP BY MG.genre_id
+        ON DUPLICATE KEY UPDATE
+            movie_count = movie_count + VALUES(movie_count),
+            sum_rating = sum_rating + VALUES(sum_rating)
+    """, [value for pair in pairs for value in pair])
+
+def remove_genre_stats(cursor, movie_ids):
+    """
+    Take the genre counts and ratings of stored movies out of Genre_Stats before they are rewritten;
+    add_genre_stats() puts the new ones back. Genres left without movies lose their row.
+    """
+    if not movie_ids:
+        return
+    ids = list(movie_ids)
+    cursor.execute(f"""
+        UPDATE Genre_Stats GS
+        JOIN (
+            SELECT MG.genre_id, COUNT(*) AS movie_count, COALESCE(SUM(M.vote_average), 0) AS sum_rating
+            FROM Movie_Genres MG
+            JOIN Movies M ON MG.movie_id = M.movie_id
+            WHERE MG.movie_id IN ({placeholders(ids)})
+            GROUP BY MG.genre_id
+        ) D ON D.genre_id = GS.genre_id
+        SET GS.movie_count = GS.movie_count - D.movie_count,
+            GS.sum_rating = GS.sum_rating - D.sum_rating
+    """, ids)
+    cursor.execute("DELETE FROM Genre_Stats WHERE movie_count <= 0")
+
+def refresh_actor_genre_counts(cursor, actor_ids):
+    """
+    Recompute distinct genre counts for `actor_ids` (a distinct count can't be updated by delta).
+    Actors no longer linked to any genre lose their row.
+    """
+    if not actor_ids:
+        return
+    ids = list(actor_ids)
+    cursor.execute(f"DELETE FROM Actor_Genre_Counts WHERE actor_id IN ({placeholders(ids)})", ids)
+    cursor.execute(f"""
+        INSERT INTO Actor_Genre_Counts (actor_id, distinct_genres)
+        SELECT MA.actor_id, COUNT(DISTINCT MG.genre_id)
+        FROM Movie_Actors MA
+        JOIN Movie_Genres MG ON MA.movie_id = MG.movie_id
+        WHERE MA.actor_id IN ({placeholders(ids)})
+        GROUP BY MA.actor_id
+    """, ids)
+
+def refresh_actor_movie_counts(cursor, actor_ids):
+    """Recompute Actors.movie_count for `actor_ids` from their Movie_Actors rows."""
+    if not actor_ids:
+        return
+    ids = list(actor_ids)
+    cursor.execute(f"""
+        UPDATE Actors A
+        LEFT JOIN (
+            SELECT actor_id, COUNT(*) AS movies
+            FROM Movie_Actors
+            WHERE actor_id IN ({placeholders(ids)})
+            GROUP BY actor_id
+        ) C ON C.actor_id = A.actor_id
+        SET A.movie_count = COALESCE(C.movies, 0)
+        WHERE A.actor_id IN ({placeholders(ids)})
+    """, ids + ids)
+
+def rebuild_actor_movie_counts(cursor):
+    cursor.execute("""
+        UPDATE Actors A
+        LEFT JOIN (
+            SELECT actor_id, COUNT(*) AS movies
+            FROM Movie_Actors
+            GROUP BY actor_id
+        ) C ON C.actor_id = A.actor_id
+        SET A.movie_count = COALESCE(C.movies, 0)
+    """)
+
+def rebuild(cursor):
+    """Recompute both summary tables and Actors.movie_count from scratch."""
+    create_tables(cursor)
+    cursor.execute("DELETE FROM Genre_Stats")
+    cursor.execute("""
+        INSERT INTO Genre_Stats (genre_id, movie_count, sum_rating)
+        SELECT MG.genre_id, COUNT(*), COALESCE(SUM(M.vote_average), 0)
+        FROM Movie_Genres MG
+        JOIN Movies M ON MG.movie_id = M.movie_id
+        GROUP BY MG.genre_id
+    """)
+    cursor.execute("DELETE FROM Actor_Genre_Counts")
+    cursor.execute("""
+        INSERT INTO Actor_Genre_Counts (actor_id, distinct_genres)
+        SELECT MA.actor_id, COUNT(DISTINCT MG.genre_id)
+        FROM Movie_Actors MA
+        JOIN Movie_Genres MG ON MA.movie_id = MG.movie_id
+        GROUP BY MA.actor_id
+    """)
+    rebuild_actor_movie_counts(cursor)
+
+class AggregateMaintainer:
+    """
+    Keeps Genre_Stats, Actor_Genre_Counts and Actors.movie_count in step with one ingest page at a time:
+    begin_page() notes which (movie, genre) links of the page's movies are already stored,
+    note_genre() / note_actor() collect the links added on this page, and apply() (after the
+    rows are flushed, before commit) updates the summaries in the same transaction. Only links
+    that were not stored before count, so a re-ingested movie that gained a genre is added too.
+    """
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.stored_genres = set()
+        self.genres = set()
+        self.actors = set()
+
+    def begin_page(self, movie_ids):
+        ids = list(movie_ids)
+        if not ids:
+            return
+        self.cursor.execute(f"SELECT movie_id, genre_id FROM Movie_Genres WHERE movie_id IN ({placeholders(ids)})", ids)
+        self.stored_genres.update(self.cursor.fetchall())
+
+    def note_genre(self, movie_id, genre_id):
+        self.genres.add((movie_id, genre_id))
+
+    def note_actor(self, actor_id):
+        self.actors.add(actor_id)
+
+    def apply(self):
+        add_genre_links(self.cursor, self.genres - self.stored_genres)
+        refresh_actor_genre_counts(self.cursor, self.actors)
+        refresh_actor_movie_counts(self.cursor, self.actors)
+        self.stored_genres = set()
+        self.genres = set()
+        self.actors = set()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the Genre_Stats / Actor_Genre_Counts summary tables.")
+    parser.add_argument('--rebuild', action='store_true', help="Recompute both tables and Actors.movie_count from the base tables")
+    args = parser.parse_args()
+    if not args.rebuild:
+        parser.print_help()
+    else:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        rebuild(cursor)
+        bump_data_version(cursor)
+        conn.commit()
+        cursor.close()
+        conn.close()
+        print("Summary tables rebuilt.")
@@ -0,0 +1,220 @@
+import argparse
+import math
+import threading
+import time
+
+import mysql.connector
+import instrumentation
+import queries_db_script
+from db_connection import get_connection
+from queries_db_script import GenreRating, VersatileActor
+from query_cache import VERSION_CHECK_INTERVAL, read_data_version
+from sql_utils import placeholders
+
+try:
+    import numpy as np
+except ImportError: # Optional: only this engine needs it (pip install numpy)
+    np = None
+
+# In-memory answers for query_3 and query_5. Movies.vote_average, Movie_Genres and
+# Movie_Actors are loaded once into NumPy arrays; per-genre counts / rating sums and
+# per-actor distinct genre counts are then computed with bincount / unique and kept
+# pre-sorted, so any min_movies_count / min_genres is a scan of an ordered array.
+# The arrays are reloaded when Data_Version moves (checked at most once per
+# check_interval), so an ingest shows up without restarting the process.
+RESULT_LIMIT = 5 # query_3 and query_5 both return the top 5
+RATING_TOLERANCE = 1e-6 # Relative; vote_average is a single-precision FLOAT
+
+def _load(cursor, sql, dtype):
+    cursor.execute(sql)
+    return np.fromiter(cursor, dtype=dtype)
+
+def genre_totals(movie_ids, ratings, mg_movies, mg_genres):
+    """(genre ids, movie counts, rating sums) over Movie_Genres x Movies, as Genre_Stats holds them."""
+    # Movie_Genres rows without a Movies row drop out, like the inner join
+    pos = np.minimum(np.searchsorted(movie_ids, mg_movies), max(len(movie_ids) - 1, 0))
+    found = movie_ids[pos] == mg_movies if len(movie_ids) else np.zeros(len(mg_movies), dtype=bool)
+    genre_ids, genre_idx = np.unique(mg_genres[found], return_inverse=True)
+    counts = np.bincount(genre_idx, minlength=len(genre_ids))
+    # FLOAT ratings summed in double precision, as SUM() does; NULL was loaded as 0
+    sums = np.bincount(genre_idx, weights=ratings[pos[found]].astype(np.float64), minlength=len(genre_ids))
+    return genre_ids, counts, sums
+
+def actor_distinct_genres(mg_movies, mg_genres, ma_movies, ma_actors):
+    """(actor ids, distinct genre counts) over Movie_Actors x Movie_Genres; mg_* sorted by movie."""
+    actor_ids, actor_idx = np.unique(ma_actors, return_inverse=True)
+    genre_ids, genre_idx = np.unique(mg_genres, return_inverse=True)
+    if not len(genre_ids):
+        return actor_ids[:0], np.zeros(0, dtype=np.int64)
+    # Each Movie_Actors row expands to its movie's run of Movie_Genres rows
+    starts = np.searchsorted(mg_movies, ma_movies, 'left')
+    lengths = np.searchsorted(mg_movies, ma_movies, 'right') - starts
+    offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(lengths.sum())
+    pairs = np.unique(np.repeat(actor_idx.astype(np.int64), lengths) * len(genre_ids) + genre_idx[offsets])
+    distinct = np.bincount(pairs // len(genre_ids), minlength=len(actor_ids))
+    # Actors whose movies have no genres have no Actor_Genre_Counts row either
+    keep = distinct > 0
+    return actor_ids[keep], distinct[keep]
+
+class AnalyticsEngine:
+    """
+    query_3 / query_5 from NumPy arrays instead of MySQL. `connect` returns a connection
+    (closed after use) for the loads, the Data_Version checks and the actor name lookups.
+    """
+
+    def __init__(self, connect=get_connection, check_interval=VERSION_CHECK_INTERVAL):
+        if np is None:
+            raise RuntimeError("The analytics engine needs NumPy (pip install numpy)")
+        self.connect = connect
+        self.check_interval = check_interval
+        self.data_version = None
+        self.loads = 0
+        self.load_seconds = 0.0
+        self._checked_at = 0.0
+        self._state = None
+        self._actor_names = {}
+        self._lock = threading.Lock()
+
+    def load(self, cursor):
+        """Read the three tables and recompute both aggregations."""
+        start = time.perf_counter()
+        with instrumentation.timed('analytics', 'load'):
+            version = read_data_version(cursor)
+            movies = _load(cursor, "SELECT movie_id, COALESCE(vote_average, 0) FROM Movies ORDER BY movie_id",
+                           [('movie_id', np.int64), ('rating', np.float32)])
+            mg = _load(cursor, "SELECT movie_id, genre_id FROM Movie_Genres ORDER BY movie_id, genre_id",
+                       [('movie_id', np.int64), ('genre_id', np.int64)])
+            ma = _load(cursor, "SELECT movie_id, actor_id FROM Movie_Actors",
+                       [('movie_id', np.int64), ('actor_id', np.int64)])
+            cursor.execute("SELECT genre_id, name FROM Genres")
+            genre_names = dict(cursor.fetchall())
+
+            genre_ids, counts, sums = genre_totals(movies['movie_id'], movies['rating'], mg['movie_id'], mg['genre_id'])
+            averages = sums / np.maximum(counts, 1)
+            genre_order = np.lexsort((genre_ids, -averages))
+            actor_ids, distinct = actor_distinct_genres(mg['movie_id'], mg['genre_id'], ma['movie_id'], ma['actor_id'])
+            actor_order = np.lexsort((actor_ids, -distinct))
+
+        # Swapped in as one object, so a concurrent query sees either the old arrays or the new ones
+        self._state = {
+            'genre_names': [genre_names.get(g) for g in genre_ids[genre_order].tolist()],
+            'genre_averages': averages[genre_order],
+            'genre_counts': counts[genre_order],
+            'actor_ids': actor_ids[actor_order],
+            'actor_distinct': distinct[actor_order],
+        }
+        self._actor_names = {}
+        self.data_version = version
+        self.loads += 1
+        self.load_seconds = time.perf_counter() - start
+        return self
+
+    def refresh(self, force=False):
+        """Reload if Data_Version moved (polled at most once per check_interval). Returns True if reloaded."""
+        now = time.monotonic()
+        if not force and self._state is not None and now - self._checked_at < self.check_interval:
+            return False
+        with self._lock:
+            if not force and self._state is not None and now - self._checked_at < self.check_interval:
+                return False
+            conn = self.connect()
+            cursor = conn.cursor()
+            try:
+                reload = force or self._state is None or read_data_version(cursor) != self.data_version
+                if reload:
+                    self.load(cursor)
+            finally:
+                cursor.close()
+                conn.close()
+            self._checked_at = time.monotonic()
+            return reload
+
+    def _names(self, actor_ids):
+        missing = [a for a in actor_ids if a not in self._actor_names]
+        if missing:
+            conn = self.connect()
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f"SELECT actor_id, name FROM Actors WHERE actor_id IN ({placeholders(missing)})",
+                               missing)
+                self._actor_names.update(cursor.fetchall())
+            finally:
+                cursor.close()
+                conn.close()
+        return [self._actor_names.get(a) for a in actor_ids]
+
+    def query_3(self, min_movies_count):
+        """Same records as queries_db_script.query_3."""
+        self.refresh()
+        state = self._state
+        rows = np.flatnonzero(state['genre_counts'] >= min_movies_count)[:RESULT_LIMIT]
+        return [GenreRating(state['genre_names'][i], float(state['genre_averages'][i]), int(state['genre_counts'][i]))
+                for i in rows.tolist()]
+
+    def query_5(self, min_genres):
+        """Same records as queries_db_script.query_5."""
+        self.refresh()
+        state = self._state
+        # Sorted by distinct genres descending, so the top 5 either qualify or nothing after them does
+        top = state['actor_distinct'][:RESULT_LIMIT]
+        count = int(np.count_nonzero(top >= min_genres))
+        actor_ids = state['actor_ids'][:count].tolist()
+        return [VersatileActor(name, distinct) for name, distinct in zip(self._names(actor_ids), top[:count].tolist())]
+
+    def stats_line(self):
+        return (f"Analytics engine: data version {self.data_version}, {self.loads} loads "
+                f"(last {self.load_seconds * 1000:.0f} ms)")
+
+def same_results(query_id, expected, actual):
+    """
+    Compare an engine answer with the SQL one. Rows whose sort value is tied (including with
+    rows past the cut-off) may come back in any order, so only the untied rows must match
+    field for field. Averages are compared to FLOAT precision, since summation order differs.
+    """
+    sort_field = 'avg_rating' if query_id == 3 else 'distinct_genres'
+    values = [getattr(r, sort_field) for r in expected]
+    if len(expected) != len(actual) or not all(
+            math.isclose(v, getattr(a, sort_field), rel_tol=RATING_TOLERANCE) for v, a in zip(values, actual)):
+        return False
+    rest = lambda r: [value for name, value in r.as_dict().items() if name != sort_field]
+    for i, (e, a) in enumerate(zip(expected, actual)):
+        tied = i == len(values) - 1 or any(j != i and math.isclose(v, values[i], rel_tol=RATING_TOLERANCE)
+                                           for j, v in enumerate(values))
+        if not tied and rest(e) != rest(a):
+            return False
+    return True
+
+def validate(engine, min_movies_counts, min_genres_values):
+    """Run both queries over the parameter sweep through SQL and the engine. Returns the mismatches."""
+    mismatches = []
+    cases = [(3, v) for v in min_movies_counts] + [(5, v) for v in min_genres_values]
+    timings = {'sql': 0.0, 'engine': 0.0}
+    for query_id, arg in cases:
+        start = time.perf_counter()
+        expected = queries_db_script.fetch(query_id, arg, use_cache=False)
+        timings['sql'] += time.perf_counter() - start
+        start = time.perf_counter()
+        actual = getattr(engine, f"query_{query_id}")(arg)
+        timings['engine'] += time.perf_counter() - start
+        if not same_results(query_id, expected, actual):
+            mismatches.append((query_id, arg, expected, actual))
+    print(f"{len(cases)} cases: SQL {timings['sql'] * 1000:.1f} ms, engine {timings['engine'] * 1000:.1f} ms")
+    return mismatches
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the NumPy query_3 / query_5 engine against the SQL queries.")
+    parser.add_argument('--min-movies', type=int, nargs='+', default=[1, 10, 50, 100, 200, 500, 1000],
+                        help="query_3 parameters to sweep")
+    parser.add_argument('--min-genres', type=int, nargs='+', default=list(range(1, 13)),
+                        help="query_5 parameters to sweep")
+    args = parser.parse_args()
+    try:
+        engine = AnalyticsEngine()
+        engine.refresh()
+        print(engine.stats_line())
+        mismatches = validate(engine, args.min_movies, args.min_genres)
+        for query_id, arg, expected, actual in mismatches:
+            print(f"Mismatch in query_{query_id}({arg}):\n  SQL:    {expected}\n  engine: {actual}")
+        print("All results match." if not mismatches else f"{len(mismatches)} mismatches.")
+    except (mysql.connector.Error, RuntimeError) as err:
+        print(f"Error: {err}")
@@ -1,17 +1,37 @@
+import argparse
+import json
 import mysql.connector
-import requests
-import time
 import os
 import sys
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import aggregates
+import instrumentation
+from batch_writer import (BatchWriter, DEFAULT_BATCH_SIZE, Genre, Movie, Actor, Producer,
+                          MovieGenre, MovieActor, MovieProducer)
+from bulk_load import BulkLoader
+from db_connection import connect_direct, get_db_connection
+from dedup import RowDedup, load_ids
+from http_cache import ResponseCache, DEFAULT_CACHE_FILE
+from ingest_pipeline import Pipeline, MySQLSink, JSONLinesSink
+from rate_limiter import AdaptiveRateLimiter, DEFAULT_RATE
+from query_cache import bump_data_version
+from sql_utils import chunks
+from tmdb_client import TMDBClient
 
 # Configuration
 API_KEY_FILE = 'api_key.txt'
-DEFAULT_DB_USER = 'matant2'
-DEFAULT_DB_PASS = 'matant2'
-DEFAULT_DB_HOST = '127.0.0.1'
-DB_NAME = 'matant2'
 MIN_RECORDS = 100 # Minimum target
+TMDB_BASE_URL = os.getenv('TMDB_BASE_URL', 'https://api.themoviedb.org/3')
+CREDITS_CONCURRENCY = int(os.getenv('CREDITS_CONCURRENCY', 8)) # Credits requests in flight at once
+CHECKPOINT_FILE = os.getenv('INGEST_CHECKPOINT_FILE', 'ingest_checkpoint.json')
+MAX_PAGES = 300 # Cap pages to avoid infinite loop
+# Movies with no Movie_Actors rows; also matches movies that really have no cast, which are
+# then just refetched (from the response cache) on every resume
+UNCREDITED_MOVIES_SQL = ("SELECT M.movie_id FROM Movies M WHERE NOT EXISTS "
+                         "(SELECT 1 FROM Movie_Actors MA WHERE MA.movie_id = M.movie_id)")
 
 def get_api_key():
     api_key = os.getenv('TMDB_API_KEY')
@@ -28,195 +48,385 @@ def get_api_key():
     print(f"Error: TMDB API Key not found. Please set TMDB_API_KEY env var or create {API_KEY_FILE}.")
     sys.exit(1)
 
-def get_db_connection():
-    user = os.getenv('DB_USER', DEFAULT_DB_USER)
-    password = os.getenv('DB_PASSWORD', DEFAULT_DB_PASS)
-    host = os.getenv('DB_HOST', DEFAULT_DB_HOST)
-    
-    creds_file = 'mysql_and_user_password.txt'
-    if os.path.exists(creds_file):
-        try:
-            with open(creds_file, 'r') as f:
-                content = f.read().strip().split()
-                if len(content) >= 2:
-                    user = content[0]
-                    password = content[1]
-        except Exception as e:
-            print(f"Warning: Could not read {creds_file}: {e}")
+def load_checkpoint(path=CHECKPOINT_FILE):
+    """
+    Read the ingest checkpoint.
+    Returns the last completed page; 0 if none. Which movies have credits is read from the DB.
+    """
+    if not os.path.exists(path):
+        return 0
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+        return int(data.get('last_page', 0))
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not read checkpoint {path}: {e}")
+        return 0
 
-    port = int(os.getenv('DB_PORT', 3305))
+def save_checkpoint(last_page, path=CHECKPOINT_FILE):
+    """Write the checkpoint atomically, so a crash mid-write leaves the previous one intact."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({
+            'last_page': last_page,
+            'updated_at': datetime.now().isoformat(timespec='seconds'),
+        }, f)
+    os.replace(tmp_path, path)
 
-    try:
-        conn = mysql.connector.connect(
-            host=host,
-            port=port,
-            user=user,
-            password=password,
-            database=DB_NAME
-        )
-        return conn
-    except mysql.connector.Error as err:
-        print(f"Error connecting to MySQL: {err}")
-        sys.exit(1)
-
-def fetch_and_populate():
-    api_key = get_api_key()
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def normalize_movie(movie, c_data):
+    """
+    Turn a discover result and its credits payload (or None) into (table, record) pairs,
+    using the typed row records from batch_writer.
+    """
+    rows = []
+    movie_id = movie['id']
 
-    base_url = "https://api.themoviedb.org/3"
-    
-    # Auth headers logic
-    params = {}
-    if len(api_key) > 40: # Read Access Token
-        headers = {
-            "accept": "application/json",
-            "Authorization": f"Bearer {api_key}"
-        }
-    else: # API API Key
-        params['api_key'] = api_key
-        headers = {"accept": "application/json"}
+    # Movie
+    title = movie.get('title', '')
+    release_date = movie.get('release_date')
+    if not release_date:
+        release_date = None
+    popularity = movie.get('popularity', 0)
+    vote_average = movie.get('vote_average', 0)
+    vote_count = movie.get('vote_count', 0)
+    overview = movie.get('overview', '')
+    original_language = movie.get('original_language', '')
+    rows.append(('Movies', Movie(movie_id, title, release_date, popularity, vote_average, vote_count, overview, original_language)))
 
-    print("Starting data retrieval...")
+    # Movie_Genres
+    # Could fail if genre_id missing in Genres (if API adds new genres not in list endpoint);
+    # the writer then retries that batch row by row.
+    for genre_id in movie.get('genre_ids', []):
+        rows.append(('Movie_Genres', MovieGenre(movie_id, genre_id)))
 
-    # 1. Fetch and Insert Genres FIRST
-    print("Fetching Genres list...")
-    genres_url = f"{base_url}/genre/movie/list"
-    try:
-        g_resp = requests.get(genres_url, headers=headers, params=params)
-        if g_resp.status_code == 200:
-            g_data = g_resp.json()
-            for g in g_data.get('genres', []):
-                gid = g['id']
-                name = g['name']
-                cursor.execute("INSERT IGNORE INTO Genres (genre_id, name) VALUES (%s, %s)", (gid, name))
-            conn.commit()
-            print("Genres populated.")
-        else:
-            print(f"Failed to fetch genres: {g_resp.status_code}")
-    except Exception as e:
-        print(f"Error fetching genres: {e}")
-        # Proceeding might fail if FKs are strict, but we try.
+    if c_data is not None:
+        rows.extend(credit_rows(movie_id, c_data))
 
-    # 2. Fetch Movies and details
-    movies_count = 0
-    page = 1
-    seen_movies = set()
-
-    while movies_count < MIN_RECORDS:
-        print(f"Fetching page {page} (Total Movies: {movies_count})...")
-        discover_url = f"{base_url}/discover/movie"
-        p = params.copy()
-        p['page'] = page
-        p['sort_by'] = 'popularity.desc'
-        
-        try:
-            response = requests.get(discover_url, headers=headers, params=p)
-            if response.status_code == 429:
-                print("Rate limit reached. Sleeping 10s...")
-                time.sleep(10)
-                continue
-            elif response.status_code != 200:
-                print(f"Error fetching page {page}: {response.status_code} {response.text}")
-                break
+    return rows
+
+def credit_rows(movie_id, c_data):
+    """Returns (table, record) pairs for the top 10 cast and the producers of a credits payload."""
+    rows = []
+    cast = c_data.get('cast', [])[:10]
+    for actor in cast:
+        actor_id = actor['id']
+        rows.append(('Actors', Actor(actor_id, actor['name'], actor.get('gender', 0))))
+        rows.append(('Movie_Actors', MovieActor(movie_id, actor_id, actor.get('character', ''))))
+
+    crew = c_data.get('crew', [])
+    producers = [m for m in crew if m['job'] == 'Producer']
+    for prod in producers:
+        prod_id = prod['id']
+        rows.append(('Producers', Producer(prod_id, prod['name'])))
+        rows.append(('Movie_Producers', MovieProducer(movie_id, prod_id)))
+    return rows
+
+def fetch_credits(client, movie_id):
+    """
+    Fetch /movie/{movie_id}/credits.
+    Returns the decoded JSON payload, or None if the request did not succeed.
+    """
+    status, c_data = client.get(f"/movie/{movie_id}/credits")
+    if status == 200:
+        return c_data
+    # The client already retried; the movie is still stored, and its credits are retried by
+    # repair_credits at the end of the run (and again by any later --resume)
+    print(f"Warning: could not fetch credits for movie {movie_id}: {status}")
+    return None
+
+def fetch_credits_batch(executor, client, movie_ids):
+    """
+    Fetch credits for all `movie_ids` concurrently on `executor`.
+    Returns a list of payloads (or None) in the same order as `movie_ids`.
+    With executor=None the requests are issued sequentially.
+    """
+    if executor is None:
+        return [fetch_credits(client, movie_id) for movie_id in movie_ids]
+    futures = [executor.submit(fetch_credits, client, movie_id) for movie_id in movie_ids]
+    return [f.result() for f in futures]
+
+# One committed unit of work: every row derived from a single discover page
+PageRows = namedtuple('PageRows', ['page', 'rows', 'movie_ids'])
+
+class DiscoverGate:
+    """
+    Keeps the discover source from reading pages the target doesn't need. It counts the new movies
+    on pages fetched but not written yet, and wait() (the pipeline's source_ready) holds the source
+    while those plus the movies already written cover `target`. A written page gives back its estimate (repeats included),
+    so the source carries on if the target turns out not to be met.
+    """
+
+    def __init__(self, target, written, stored_movies):
+        self.target = target
+        self.written = written
+        self.stored_movies = stored_movies
+        self.in_flight = {} # page -> new movies on it, estimated when fetched
+        self._cond = threading.Condition()
+
+    def wait(self, stopped):
+        """Block until another page is needed. False once the target is met or `stopped()` is true."""
+        with self._cond:
+            while self.written + sum(self.in_flight.values()) >= self.target:
+                if self.written >= self.target or stopped():
+                    return False
+                self._cond.wait(0.1)
+            return True
+
+    def fetched(self, page, results):
+        with self._cond:
+            self.in_flight[page] = sum(1 for movie in results if movie['id'] not in self.stored_movies)
+
+    def page_written(self, page, written):
+        with self._cond:
+            self.in_flight.pop(page, None)
+            self.written = written
+            self._cond.notify_all()
 
-            data = response.json()
-            results = data.get('results', [])
-            
-            if not results:
-                print("No more results.")
-                break
+def discover_pages(client, first_page, max_pages, gate=None):
+    """
+    Pipeline source: yields (page, results) for discover pages until results run out or max_pages.
+    Fetched pages are reported to `gate` (a DiscoverGate) so it can estimate what is in flight.
+    """
+    for page in range(first_page, max_pages + 1):
+        print(f"Fetching page {page}...")
+        status, data = client.get("/discover/movie", page=page, sort_by='popularity.desc')
+        if status != 200:
+            print(f"Error fetching page {page}: {status} {data}")
+            return
+        results = data.get('results', [])
+        if not results:
+            print("No more results.")
+            return
+        if gate is not None:
+            gate.fetched(page, results)
+        yield page, results
 
+def credits_stage(client, executor, seen_movies, failed=None):
+    """
+    Pipeline stage: drops movies already seen and yields (page, [(movie, credits or None)]).
+    Ids whose credits could not be fetched are appended to `failed`.
+    """
+    def stage(pages):
+        for page, results in pages:
+            new_movies = []
             for movie in results:
                 movie_id = movie['id']
                 if movie_id in seen_movies:
                     continue
                 seen_movies.add(movie_id)
+                new_movies.append(movie)
+            credits_list = fetch_credits_batch(executor, client, [m['id'] for m in new_movies])
+            if failed is not None:
+                failed.extend(m['id'] for m, c in zip(new_movies, credits_list) if c is None)
+            yield page, list(zip(new_movies, credits_list))
+    return stage
 
-                # Insert Movie
-                title = movie.get('title', '')
-                release_date = movie.get('release_date')
-                if not release_date: 
-                    release_date = None
-                popularity = movie.get('popularity', 0)
-                vote_average = movie.get('vote_average', 0)
-                vote_count = movie.get('vote_count', 0)
-                overview = movie.get('overview', '')
-                original_language = movie.get('original_language', '')
-
-                insert_movie_sql = """
-                    INSERT IGNORE INTO Movies (movie_id, title, release_date, popularity, vote_average, vote_count, overview, original_language)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                """
-                cursor.execute(insert_movie_sql, (movie_id, title, release_date, popularity, vote_average, vote_count, overview, original_language))
-
-                # Insert Movie_Genres
-                # Now that Genres table is populated (hopefully), this should work.
-                for genre_id in movie.get('genre_ids', []):
-                    try:
-                        cursor.execute("INSERT IGNORE INTO Movie_Genres (movie_id, genre_id) VALUES (%s, %s)", (movie_id, genre_id))
-                    except mysql.connector.Error as err:
-                        # Could fail if genre_id missing in Genres (if API adds new genres not in list endpoint)
-                        pass
-
-                # Fetch Credits
-                credits_url = f"{base_url}/movie/{movie_id}/credits"
-                c_resp = requests.get(credits_url, headers=headers, params=params)
-                # Simple retry logic
-                if c_resp.status_code == 429:
-                    time.sleep(5)
-                    c_resp = requests.get(credits_url, headers=headers, params=params)
-                
-                if c_resp.status_code == 200:
-                    c_data = c_resp.json()
-                    cast = c_data.get('cast', [])[:10] 
-                    
-                    for actor in cast:
-                        actor_id = actor['id']
-                        name = actor['name']
-                        gender = actor.get('gender', 0)
-                        
-                        cursor.execute("INSERT IGNORE INTO Actors (actor_id, name, gender) VALUES (%s, %s, %s)", (actor_id, name, gender))
-                        
-                        try:
-                            cursor.execute("""
-                                INSERT IGNORE INTO Movie_Actors (movie_id, actor_id, character_name)
-                                VALUES (%s, %s, %s)
-                            """, (movie_id, actor_id, actor.get('character', '')))
-                        except:
-                            print("Failed to insert Movie_Actors")
-                            pass
-
-                    crew = c_data.get('crew', [])
-                    producers = [m for m in crew if m['job'] == 'Producer']
-                    for prod in producers:
-                        prod_id = prod['id']
-                        name = prod['name']
-                        
-                        cursor.execute("INSERT IGNORE INTO Producers (producer_id, name) VALUES (%s, %s)", (prod_id, name))
-                        
-                        try:
-                            cursor.execute("INSERT IGNORE INTO Movie_Producers (movie_id, producer_id) VALUES (%s, %s)", (movie_id, prod_id))
-                        except:
-                            pass
+def repair_credits(client, executor, sink, movie_ids, batch_size=20):
+    """
+    Fetches credits again for stored movies that have none and writes their cast and producer rows.
+    Returns the ids whose credits still could not be fetched.
+    """
+    missing = []
+    for batch in chunks(movie_ids, batch_size):
+        sink.begin_page(batch)
+        for movie_id, c_data in zip(batch, fetch_credits_batch(executor, client, batch)):
+            if c_data is None:
+                missing.append(movie_id)
+                continue
+            for table, row in credit_rows(movie_id, c_data):
+                sink.add(table, row)
+        sink.commit()
+    return missing
+
+def normalize_stage(movies_pages):
+    """Pipeline stage: yields a PageRows per page."""
+    for page, movies in movies_pages:
+        rows = []
+        for movie, c_data in movies:
+            rows.extend(normalize_movie(movie, c_data))
+        yield PageRows(page, rows, [movie['id'] for movie, _ in movies])
+
+def fetch_and_populate(concurrency=CREDITS_CONCURRENCY, batch_size=DEFAULT_BATCH_SIZE, resume=False, cache_file=DEFAULT_CACHE_FILE,
+                       rate_limit=DEFAULT_RATE, bulk=False, target=MIN_RECORDS, max_pages=MAX_PAGES, jsonl_path=None):
+    """
+    Populate the DB from TMDB until `target` movies are stored (or `max_pages` discover pages are read).
+    With resume=True, continue after the last checkpointed page, count movies already in the DB
+    towards the target, and skip the credits fetch for movies that already have credits.
+    Responses are cached in `cache_file` (None disables the cache); requests are throttled to
+    `rate_limit` per second and slowed down further if TMDB answers 429.
+    With bulk=True, rows are spooled to TSV files and loaded with LOAD DATA LOCAL INFILE at the end;
+    the checkpoint is then only written after the load.
+    With jsonl_path, rows are written to that JSON-lines file instead of MySQL.
+
+    Pages flow through a pipeline of threaded stages (discover -> credits -> normalize -> sink)
+    connected by bounded queues, so fetching page N+1 overlaps with writing page N.
+    """
+    api_key = get_api_key()
+    cache = ResponseCache(cache_file) if cache_file else None
+    client = TMDBClient(api_key, TMDB_BASE_URL, cache, AdaptiveRateLimiter(rate_limit))
+    conn = get_db_connection() if (resume or not jsonl_path) else None
+    cursor = conn.cursor() if conn is not None else None
+
+    # Id sets are bitmaps sharing the dedup memory ceiling
+    dedup = RowDedup()
+    if not jsonl_path:
+        dedup.seed(conn)
+
+    # Resume state
+    last_page = 0
+    credited_movies = dedup.id_set()
+    stored_movies = dedup.id_set()
+    genres_loaded = False
+    if resume:
+        last_page = load_checkpoint()
+        load_ids(conn, "SELECT DISTINCT movie_id FROM Movie_Actors", credited_movies)
+        load_ids(conn, "SELECT movie_id FROM Movies", stored_movies)
+        cursor.execute("SELECT COUNT(*) FROM Genres")
+        genres_loaded = cursor.fetchone()[0] > 0
+        print(f"Resuming after page {last_page}: {len(stored_movies)} movies in DB, {len(credited_movies)} with credits.")
+
+    if jsonl_path:
+        sink = JSONLinesSink(jsonl_path)
+        writer = sink
+    else:
+        writer = BulkLoader() if bulk else BatchWriter(cursor, batch_size)
+        # Bulk loads rebuild the summary tables once after LOAD DATA instead
+        maintainer = None if bulk else aggregates.AggregateMaintainer(cursor)
+        sink = MySQLSink(conn, writer, durable=not bulk, aggregates=maintainer, dedup=dedup)
+
+    # Credits are fetched a whole discover page at a time; only the sink touches the DB.
+    executor = ThreadPoolExecutor(max_workers=concurrency) if concurrency > 1 else None
+
+    print("Starting data retrieval...")
+
+    # 1. Fetch and Insert Genres FIRST
+    if genres_loaded:
+        print("Genres already populated.")
+    else:
+        print("Fetching Genres list...")
+        try:
+            status, g_data = client.get("/genre/movie/list")
+            if status == 200:
+                for g in g_data.get('genres', []):
+                    sink.add('Genres', Genre(g['id'], g['name']))
+                sink.commit()
+                print("Genres populated.")
+            else:
+                print(f"Failed to fetch genres: {status}")
+        except Exception as e:
+            print(f"Error fetching genres: {e}")
+            # Proceeding might fail if FKs are strict, but we try.
 
+    # 2. Fetch Movies and details
+    movies_count = len(stored_movies)
+    # Movies that are stored with their credits need neither a DB write nor a credits request
+    # (a Movie_Actors row implies its Movies row); the set grows as pages are read
+    seen_movies = credited_movies
+
+    def write_page(batch):
+        nonlocal movies_count, last_page
+        sink.begin_page(batch.movie_ids)
+        for table, row in batch.rows:
+            sink.add(table, row)
+        for movie_id in batch.movie_ids:
+            if movie_id not in stored_movies:
                 movies_count += 1
                 if movies_count % 50 == 0:
-                    conn.commit()
                     print(f"Processed {movies_count} movies...")
+        # Checkpoint only once the page is committed
+        if sink.commit():
+            save_checkpoint(batch.page)
+        last_page = batch.page
+        gate.page_written(batch.page, movies_count)
+        return movies_count < target
+
+    # Checkpointed pages are never read again, so movies stored without credits (a failed
+    # credits request, or an earlier run that stopped) are refetched by id
+    failed_credits = []
+    if resume and not jsonl_path:
+        cursor.execute(UNCREDITED_MOVIES_SQL)
+        failed_credits = [row[0] for row in cursor.fetchall()]
+        if failed_credits:
+            print(f"Refetching credits for {len(failed_credits)} stored movies without cast...")
+            failed_credits = repair_credits(client, executor, sink, failed_credits)
 
-            page += 1
-            if page > 300: # Cap pages to avoid infinite loop
-                break
-                
+    gate = DiscoverGate(target, movies_count, stored_movies)
+    pipeline = Pipeline(
+        ('discover', lambda: discover_pages(client, last_page + 1, max_pages, gate)),
+        [('credits', credits_stage(client, executor, seen_movies, failed_credits)), ('normalize', normalize_stage)],
+        source_ready=lambda: gate.wait(pipeline.stopped),
+    )
+    if movies_count < target:
+        try:
+            pipeline.consume(write_page)
+        except Exception as e:
+            print(f"Error processing page {last_page + 1}: {e}")
+
+    if failed_credits:
+        print(f"Retrying credits for {len(failed_credits)} movies...")
+        try:
+            missing = repair_credits(client, executor, sink, failed_credits)
+            if missing:
+                print(f"Warning: {len(missing)} movies are still stored without credits; --resume retries them.")
         except Exception as e:
-            print(f"Error processing page {page}: {e}")
-            break
+            print(f"Error retrying credits: {e}")
 
-    conn.commit()
-    cursor.close()
-    conn.close()
-    print("Data Retrieval and Insertion Complete.")
+    if executor is not None:
+        executor.shutdown()
+    sink.close()
+    if cursor is not None:
+        cursor.close()
+        conn.close()
+    if bulk and not jsonl_path:
+        try:
+            bulk_conn = connect_direct(allow_local_infile=True)
+            try:
+                writer.load(bulk_conn)
+                bulk_cursor = bulk_conn.cursor()
+                aggregates.rebuild(bulk_cursor)
+                bump_data_version(bulk_cursor)
+                bulk_conn.commit()
+                bulk_cursor.close()
+            finally:
+                bulk_conn.close()
+            save_checkpoint(last_page)
+        except mysql.connector.Error as err:
+            print(f"Bulk load failed: {err}. Spooled rows kept in {writer.spool_dir}")
+        else:
+            writer.cleanup()
+    if jsonl_path:
+        print(f"Data Retrieval Complete. ({writer.rows_written} rows written to {jsonl_path}, {movies_count} movies)")
+    else:
+        print(f"Data Retrieval and Insertion Complete. ({writer.rows_written} rows in {writer.batches_sent} batches)")
+    pipeline.report()
+    if not jsonl_path:
+        print(dedup.stats_line())
+    print(client.limiter.stats_line())
+    if cache is not None:
+        print(cache.stats_line())
+        cache.close()
 
 if __name__ == "__main__":
-    fetch_and_populate()
+    parser = argparse.ArgumentParser(description="Populate the movie DB from the TMDB API.")
+    parser.add_argument('--resume', action='store_true', help=f"Continue from the checkpoint in {CHECKPOINT_FILE}")
+    parser.add_argument('--concurrency', type=int, default=CREDITS_CONCURRENCY, help="Credits requests in flight at once")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Rows per multi-row INSERT")
+    parser.add_argument('--cache-file', default=DEFAULT_CACHE_FILE, help="SQLite file for cached TMDB responses")
+    parser.add_argument('--no-cache', action='store_true', help="Always hit the network")
+    parser.add_argument('--rate-limit', type=float, default=DEFAULT_RATE, help="Max TMDB requests per second")
+    parser.add_argument('--bulk', action='store_true', help="Spool rows to TSV and load them with LOAD DATA LOCAL INFILE")
+    parser.add_argument('--target', type=int, default=MIN_RECORDS, help="Number of movies to ingest")
+    parser.add_argument('--max-pages', type=int, default=MAX_PAGES, help="Stop after this many discover pages")
+    parser.add_argument('--jsonl', metavar='PATH', help="Write rows to a JSON-lines file instead of MySQL")
+    parser.add_argument('--profile', action='store_true', help="Time every TMDB request, SQL statement and commit")
+    parser.add_argument('--profile-json', metavar='PATH', help="Also write the profile to this JSON file (implies --profile)")
+    args = parser.parse_args()
+    if args.profile or args.profile_json:
+        instrumentation.enable()
+    fetch_and_populate(concurrency=args.concurrency, batch_size=args.batch_size, resume=args.resume,
+                       cache_file=None if args.no_cache else args.cache_file, rate_limit=args.rate_limit,
+                       bulk=args.bulk, target=args.target, max_pages=args.max_pages, jsonl_path=args.jsonl)
+    if instrumentation.ENABLED:
+        instrumentation.report()
+        if args.profile_json:
+            instrumentation.dump(args.profile_json)
@@ -0,0 +1,106 @@
+import mysql.connector
+from mysql.connector import errorcode
+import os
+from collections import namedtuple
+import instrumentation
+from sql_utils import placeholders
+
+DEFAULT_BATCH_SIZE = int(os.getenv('INSERT_BATCH_SIZE', 500))
+
+# Column lists per table, in FK-safe flush order: parents (Genres, Movies, Actors,
+# Producers) are always written before the link tables that reference them.
+TABLE_COLUMNS = {
+    'Genres': ('genre_id', 'name'),
+    'Movies': ('movie_id', 'title', 'release_date', 'popularity', 'vote_average', 'vote_count', 'overview', 'original_language'),
+    'Actors': ('actor_id', 'name', 'gender'),
+    'Producers': ('producer_id', 'name'),
+    'Movie_Genres': ('movie_id', 'genre_id'),
+    'Movie_Actors': ('movie_id', 'actor_id', 'character_name'),
+    'Movie_Producers': ('movie_id', 'producer_id'),
+}
+FLUSH_ORDER = list(TABLE_COLUMNS)
+# Leading columns of each row that form the primary key
+PRIMARY_KEY_LENGTH = {table: 2 if table.startswith('Movie_') else 1 for table in TABLE_COLUMNS}
+# InnoDB rolled back the whole transaction; the caller has to redo it, not this writer
+LOCK_ERRNOS = {errorcode.ER_LOCK_DEADLOCK, errorcode.ER_LOCK_WAIT_TIMEOUT}
+
+# Typed row records, one per table; they are plain tuples as far as executemany is concerned.
+Genre = namedtuple('Genre', TABLE_COLUMNS['Genres'])
+Movie = namedtuple('Movie', TABLE_COLUMNS['Movies'])
+Actor = namedtuple('Actor', TABLE_COLUMNS['Actors'])
+Producer = namedtuple('Producer', TABLE_COLUMNS['Producers'])
+MovieGenre = namedtuple('MovieGenre', TABLE_COLUMNS['Movie_Genres'])
+MovieActor = namedtuple('MovieActor', TABLE_COLUMNS['Movie_Actors'])
+MovieProducer = namedtuple('MovieProducer', TABLE_COLUMNS['Movie_Producers'])
+
+def insert_ignore_sql(table):
+    columns = TABLE_COLUMNS[table]
+    return f"INSERT IGNORE INTO {table} ({', '.join(columns)}) VALUES ({placeholders(columns)})"
+
+def upsert_sql(table):
+    """INSERT ... ON DUPLICATE KEY UPDATE of every non-key column (INSERT IGNORE if there are none)."""
+    columns = TABLE_COLUMNS[table]
+    updates = columns[PRIMARY_KEY_LENGTH[table]:]
+    if not updates:
+        return insert_ignore_sql(table)
+    assignments = ", ".join(f"{column} = VALUES({column})" for column in updates)
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders(columns)}) ON DUPLICATE KEY UPDATE {assignments}"
+
+class BatchWriter:
+    """
+    Buffers rows per table and writes them as multi-row INSERT IGNORE batches.
+    Once any table holds `batch_size` rows, every buffer is flushed in FLUSH_ORDER.
+    Committing stays with the caller; call flush() before conn.commit().
+    Each batch is inserted in primary-key order, so concurrent writers sharing actors and
+    producers take their row locks in the same order. Deadlocks and lock wait timeouts are
+    re-raised: InnoDB has rolled back the transaction, so the caller must discard() and redo it.
+    """
+
+    def __init__(self, cursor, batch_size=DEFAULT_BATCH_SIZE):
+        self.cursor = cursor
+        self.batch_size = max(1, batch_size)
+        self.buffers = {table: [] for table in FLUSH_ORDER}
+        self.statements = {table: insert_ignore_sql(table) for table in FLUSH_ORDER}
+        self.rows_written = 0
+        self.batches_sent = 0
+
+    def add(self, table, row):
+        buf = self.buffers[table]
+        buf.append(row)
+        if len(buf) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        for table in FLUSH_ORDER:
+            rows = self.buffers[table]
+            if rows:
+                self.buffers[table] = []
+                self._insert(table, rows)
+
+    def discard(self):
+        """Drop buffered rows (after a rollback)."""
+        self.buffers = {table: [] for table in FLUSH_ORDER}
+
+    def _insert(self, table, rows):
+        sql = self.statements[table]
+        key_length = PRIMARY_KEY_LENGTH[table]
+        rows.sort(key=lambda row: row[:key_length])
+        try:
+            # mysql.connector rewrites this into a single INSERT ... VALUES (...),(...)
+            with instrumentation.timed('sql', f"INSERT {table}"):
+                self.cursor.executemany(sql, rows)
+            self.batches_sent += 1
+        except mysql.connector.Error as err:
+            if err.errno in LOCK_ERRNOS:
+                raise
+            # Don't lose the whole batch for one bad row (e.g. a genre id missing from Genres)
+            print(f"Warning: batch insert into {table} failed ({err}). Retrying row by row.")
+            for row in rows:
+                try:
+                    self.cursor.execute(sql, row)
+                except mysql.connector.Error as row_err:
+                    if row_err.errno in LOCK_ERRNOS:
+                        raise
+            self.batches_sent += len(rows)
+        self.rows_written += len(rows)
+        instrumentation.count('rows', table, len(rows))
@@ -0,0 +1,230 @@
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import aggregates
+import api_data_retrieve
+import delta_refresh
+import mock_tmdb_server
+import sharded_ingest
+from batch_writer import BatchWriter, DEFAULT_BATCH_SIZE
+from bulk_load import BulkLoader
+from db_connection import connect_direct
+from rate_limiter import AdaptiveRateLimiter
+from sql_utils import chunks, placeholders
+from synthetic_data import reset_tables
+from tmdb_client import TMDBClient
+
+def time_credits_fetch(base_url, movie_ids, concurrency, client_rate):
+    """Fetch credits for `movie_ids` one discover page at a time. Returns (seconds, payloads, client)."""
+    client = TMDBClient('benchmark', base_url, limiter=AdaptiveRateLimiter(client_rate))
+    executor = ThreadPoolExecutor(max_workers=concurrency) if concurrency > 1 else None
+    payloads = []
+    start = time.perf_counter()
+    page_size = mock_tmdb_server.MOVIES_PER_PAGE
+    for page_ids in chunks(movie_ids, page_size):
+        payloads.extend(api_data_retrieve.fetch_credits_batch(executor, client, page_ids))
+    elapsed = time.perf_counter() - start
+    if executor is not None:
+        executor.shutdown()
+    return elapsed, payloads, client
+
+def bench_credits(args):
+    server, base_url = mock_tmdb_server.start_server(latency=args.latency, rate_limit=args.server_rate)
+    movie_ids = list(range(1, args.movies + 1))
+    try:
+        seq_time, seq_payloads, _ = time_credits_fetch(base_url, movie_ids, 1, args.client_rate)
+        con_time, con_payloads, con_client = time_credits_fetch(base_url, movie_ids, args.concurrency, args.client_rate)
+        throttled = server.throttled()
+    finally:
+        server.shutdown()
+
+    print(f"-- Credits fetch for {args.movies} movies (mock latency {args.latency * 1000:.0f} ms) --")
+    print(f"Sequential:      {seq_time:.2f}s ({args.movies / seq_time:.1f} movies/s)")
+    print(f"Concurrent x{args.concurrency:<3} {con_time:.2f}s ({args.movies / con_time:.1f} movies/s)")
+    print(f"Speedup: {seq_time / con_time:.1f}x | Identical payloads: {seq_payloads == con_payloads}")
+    if args.server_rate:
+        missing = sum(1 for payload in con_payloads if payload is None)
+        print(f"Server sent {throttled} x 429 | {con_client.limiter.stats_line()} | Retries: {con_client.retries} | Movies without credits: {missing}")
+
+def synthetic_rows(movies):
+    """(table, row) pairs for `movies` mock TMDB movies, normalized exactly like a real ingest."""
+    rows = [('Genres', genre) for genre in mock_tmdb_server.GENRES]
+    for movie_id in range(1, movies + 1):
+        rows.extend(api_data_retrieve.normalize_movie(mock_tmdb_server.make_movie(movie_id), mock_tmdb_server.make_credits(movie_id)))
+    return rows
+
+def bench_load(args):
+    if not args.reset_tables:
+        print("The load benchmark empties all seven tables between runs. Re-run with --reset-tables to confirm.")
+        return
+    rows = synthetic_rows(args.movies)
+    conn = connect_direct(allow_local_infile=True)
+    try:
+        # INSERT IGNORE path
+        reset_tables(conn)
+        cursor = conn.cursor()
+        start = time.perf_counter()
+        writer = BatchWriter(cursor, args.batch_size)
+        for table, row in rows:
+            writer.add(table, row)
+        writer.flush()
+        conn.commit()
+        insert_time = time.perf_counter() - start
+        cursor.close()
+
+        # LOAD DATA path (spooling included in the timing)
+        reset_tables(conn)
+        start = time.perf_counter()
+        loader = BulkLoader()
+        for table, row in rows:
+            loader.add(table, row)
+        loader.load(conn)
+        bulk_time = time.perf_counter() - start
+        loader.cleanup()
+    finally:
+        conn.close()
+
+    print(f"-- Loading {len(rows)} rows ({args.movies} movies) --")
+    print(f"INSERT IGNORE (batch {args.batch_size}): {insert_time:.2f}s ({len(rows) / insert_time:.0f} rows/s)")
+    print(f"LOAD DATA LOCAL INFILE:        {bulk_time:.2f}s ({len(rows) / bulk_time:.0f} rows/s)")
+    print(f"Speedup: {insert_time / bulk_time:.1f}x")
+
+def bench_shards(args):
+    if not args.reset_tables:
+        print("The shard benchmark empties all tables before each run. Re-run with --reset-tables to confirm.")
+        return
+    os.environ.setdefault('TMDB_API_KEY', 'benchmark')
+    server, base_url = mock_tmdb_server.start_server(latency=args.latency)
+    results = []
+    try:
+        workers = 1
+        while workers <= args.max_workers:
+            conn = connect_direct()
+            reset_tables(conn)
+            conn.close()
+            elapsed, totals = sharded_ingest.sharded_ingest(workers, 1, args.pages, args.client_rate, base_url=base_url)
+            sharded_ingest.print_totals(elapsed, totals)
+            results.append((workers, sum(t['movies'] for t in totals) / elapsed))
+            workers *= 2
+    finally:
+        server.shutdown()
+
+    print(f"-- Sharded ingest of {args.pages} pages (mock latency {args.latency * 1000:.0f} ms) --")
+    base = results[0][1] if results else 0
+    for workers, rate in results:
+        print(f"{workers:>3} worker(s): {rate:8.1f} movies/s ({rate / base:.1f}x)")
+
+def stored_state(cursor, movie_ids):
+    """{movie_id: (popularity, vote_count, genre ids, actor ids)} as stored in the DB."""
+    ids = sorted(movie_ids)
+    in_list = placeholders(ids)
+    state = {movie_id: [None, None, set(), set()] for movie_id in ids}
+    cursor.execute(f"SELECT movie_id, popularity, vote_count FROM Movies WHERE movie_id IN ({in_list})", ids)
+    for movie_id, popularity, vote_count in cursor.fetchall():
+        state[movie_id][:2] = [round(popularity, 3), vote_count]
+    for table, column, slot in (('Movie_Genres', 'genre_id', 2), ('Movie_Actors', 'actor_id', 3)):
+        cursor.execute(f"SELECT movie_id, {column} FROM {table} WHERE movie_id IN ({in_list})", ids)
+        for movie_id, other_id in cursor.fetchall():
+            state[movie_id][slot].add(other_id)
+    return {movie_id: tuple(values) for movie_id, values in state.items()}
+
+def expected_state(movie_id, revision):
+    details = mock_tmdb_server.make_details(movie_id, revision, credits=True)
+    return (round(details['popularity'], 3), details['vote_count'], {g['id'] for g in details['genres']},
+            {actor['id'] for actor in details['credits']['cast'][:10]})
+
+def summary_tables(cursor):
+    cursor.execute("SELECT genre_id, movie_count, ROUND(sum_rating, 3) FROM Genre_Stats ORDER BY genre_id")
+    genre_stats = cursor.fetchall()
+    cursor.execute("SELECT actor_id, distinct_genres FROM Actor_Genre_Counts ORDER BY actor_id")
+    return genre_stats, cursor.fetchall()
+
+def bench_refresh(args):
+    if not args.reset_tables:
+        print("The refresh benchmark empties all tables first. Re-run with --reset-tables to confirm.")
+        return
+    os.environ.setdefault('TMDB_API_KEY', 'benchmark')
+    server, base_url = mock_tmdb_server.start_server(latency=args.latency)
+    try:
+        conn = connect_direct()
+        reset_tables(conn)
+        conn.close()
+        start = time.perf_counter()
+        _, totals = sharded_ingest.sharded_ingest(1, 1, args.pages, args.client_rate, base_url=base_url)
+        ingest_time = time.perf_counter() - start
+        ingest_requests = sum(t['requests'] for t in totals)
+        catalog = args.pages * mock_tmdb_server.MOVIES_PER_PAGE
+
+        # Churn among our movies, plus changes to movies the DB has never seen
+        rng = random.Random(42)
+        changed = rng.sample(range(1, catalog + 1), max(1, int(catalog * args.churn)))
+        server.change_movies(changed + list(range(catalog + 1, catalog + 1 + len(changed))))
+        start = time.perf_counter()
+        refresh_totals = delta_refresh.delta_refresh(since=datetime.now(timezone.utc).date(), rate_limit=args.client_rate,
+                                                     base_url=base_url)
+        refresh_time = time.perf_counter() - start
+
+        conn = connect_direct()
+        cursor = conn.cursor()
+        stored = stored_state(cursor, changed)
+        stale = [movie_id for movie_id in changed if stored[movie_id] != expected_state(movie_id, 1)]
+        incremental = summary_tables(cursor)
+        aggregates.rebuild(cursor)
+        conn.commit()
+        rebuilt = summary_tables(cursor)
+        cursor.close()
+        conn.close()
+    finally:
+        server.shutdown()
+
+    print(f"-- Delta refresh of {len(changed)} changed movies in a {catalog}-movie catalog "
+          f"(mock latency {args.latency * 1000:.0f} ms) --")
+    print(f"Full ingest:   {ingest_time:.2f}s, {ingest_requests} requests")
+    print(f"Delta refresh: {refresh_time:.2f}s, {refresh_totals['requests']} requests")
+    delta_refresh.print_totals(refresh_totals, refresh_time)
+    print(f"Movies matching TMDB after refresh: {len(changed) - len(stale)}/{len(changed)} | "
+          f"Summary tables match a full rebuild: {incremental == rebuilt}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest benchmarks against a local mock TMDB server / local MySQL.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    credits = sub.add_parser('credits', help="Sequential vs concurrent credits fetching")
+    credits.add_argument('--movies', type=int, default=100, help="Number of movies to fetch credits for")
+    credits.add_argument('--latency', type=float, default=mock_tmdb_server.DEFAULT_LATENCY, help="Mock server latency per request (seconds)")
+    credits.add_argument('--concurrency', type=int, default=api_data_retrieve.CREDITS_CONCURRENCY, help="Concurrent credits requests")
+    credits.add_argument('--client-rate', type=float, default=1000, help="Client-side rate limit (req/s)")
+    credits.add_argument('--server-rate', type=int, default=0, help="Mock server answers 429 beyond this many req/s (0 = never)")
+    credits.set_defaults(func=bench_credits)
+
+    load = sub.add_parser('load', help="INSERT IGNORE batches vs LOAD DATA LOCAL INFILE (rows/s)")
+    load.add_argument('--movies', type=int, default=20000, help="Number of synthetic movies to load")
+    load.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Rows per multi-row INSERT")
+    load.add_argument('--reset-tables', action='store_true', help="Allow emptying all tables between runs")
+    load.set_defaults(func=bench_load)
+
+    shards = sub.add_parser('shards', help="Sharded multi-process ingest throughput, 1 to --max-workers workers")
+    shards.add_argument('--pages', type=int, default=40, help="Discover pages to ingest per run")
+    shards.add_argument('--max-workers', type=int, default=sharded_ingest.DEFAULT_WORKERS, help="Largest worker count (doubling from 1)")
+    shards.add_argument('--latency', type=float, default=mock_tmdb_server.DEFAULT_LATENCY, help="Mock server latency per request (seconds)")
+    shards.add_argument('--client-rate', type=float, default=1000, help="Global client-side rate limit (req/s)")
+    shards.add_argument('--reset-tables', action='store_true', help="Allow emptying all tables between runs")
+    shards.set_defaults(func=bench_shards)
+
+    refresh = sub.add_parser('refresh', help="Delta refresh of a churned catalog vs the full ingest")
+    refresh.add_argument('--pages', type=int, default=25, help="Discover pages in the initial ingest")
+    refresh.add_argument('--churn', type=float, default=0.02, help="Fraction of the catalog changed on the mock TMDB")
+    refresh.add_argument('--latency', type=float, default=mock_tmdb_server.DEFAULT_LATENCY, help="Mock server latency per request (seconds)")
+    refresh.add_argument('--client-rate', type=float, default=1000, help="Client-side rate limit (req/s)")
+    refresh.add_argument('--reset-tables', action='store_true', help="Allow emptying all tables first")
+    refresh.set_defaults(func=bench_refresh)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+import argparse
+import datetime
+import json
+import statistics
+import time
+
+import mysql.connector
+import queries_db_script
+from batch_writer import FLUSH_ORDER
+from db_connection import connect_direct
+from instrumentation import percentile
+from migrations import has_index
+
+# Parameter sweeps per query: from selective to broad
+KEYWORDS = ['Star', 'Star Wars', 'Love', 'Ghost Island', 'Night']
+NAMES = ['Tom', 'Tom Hanks', 'Lucia', 'Kim', 'Olga Ivanov']
+MIN_MOVIES = [1, 10, 100, 1000]
+MIN_GENRES = [2, 3, 5, 8]
+SAMPLED_ACTORS = 5 # query_4 runs for this many actors, from the most to the least credited
+BROWSE_PAGES = [1, 10, 100, 1000] # Page depths of the popularity listing, keyset vs OFFSET
+# Full-text cases per search mode: names shared by tens of thousands of actors at 1M actors
+# (synthetic_data.py --movies 400000 --actors 1200000) and a token below the default minimum length
+SEARCH_NAMES = ['Tom', 'Smith', 'John Smith', 'Ji']
+SEARCH_KEYWORDS = ['Star', 'Ice', 'Star Wars']
+
+# query_4 as it was before it was driven from the actor: a correlated EXISTS per producer.
+# Kept as the baseline of the query_4 cases (selecting producer_id too, so row counts compare).
+EXISTS_QUERY_4_SQL = """
+    SELECT P.producer_id, P.name
+    FROM Producers P
+    WHERE EXISTS (
+        SELECT 1
+        FROM Movie_Producers MP
+        JOIN Movies M ON MP.movie_id = M.movie_id
+        JOIN Movie_Actors MA ON M.movie_id = MA.movie_id
+        JOIN Actors A ON MA.actor_id = A.actor_id
+        WHERE MP.producer_id = P.producer_id
+        AND A.name = %s
+    )
+    LIMIT 20;
+"""
+
+# query_2 as it was before Actors.movie_count: every matching actor joined to Movie_Actors and grouped
+# before the top 3 are picked. Kept as the baseline of the query_2_* cases.
+JOIN_QUERY_2_SQL = """
+    SELECT
+        A.name,
+        COUNT(DISTINCT MA.movie_id) AS movies_in_db
+    FROM Actors A
+    JOIN Movie_Actors MA ON A.actor_id = MA.actor_id
+    WHERE MATCH(A.name) AGAINST (%s IN NATURAL LANGUAGE MODE)
+    GROUP BY A.actor_id, A.name
+    ORDER BY MATCH(A.name) AGAINST (%s IN NATURAL LANGUAGE MODE) DESC, movies_in_db DESC
+    LIMIT 3;
+"""
+
+def sample_actor_names(cursor, count=SAMPLED_ACTORS):
+    """Names of actors spread over the credit-count distribution (busiest first)."""
+    cursor.execute("""
+        SELECT A.name, COUNT(*) AS credits
+        FROM Movie_Actors MA
+        JOIN Actors A ON A.actor_id = MA.actor_id
+        GROUP BY MA.actor_id, A.name
+        ORDER BY credits DESC
+    """)
+    rows = cursor.fetchall()
+    if not rows:
+        return []
+    step = max(1, len(rows) // count)
+    return [rows[i][0] for i in range(0, len(rows), step)][:count]
+
+def browse_cases(cursor, page_size=queries_db_script.BROWSE_PAGE_SIZE):
+    """The popularity listing at each BROWSE_PAGES depth, as a keyset seek and as the equivalent OFFSET."""
+    cases = []
+    first_sql, _ = queries_db_script.browse_query(limit=page_size)
+    for page in BROWSE_PAGES:
+        skip = (page - 1) * page_size
+        after = None
+        if skip:
+            cursor.execute("""
+                SELECT popularity, movie_id FROM Movies WHERE popularity IS NOT NULL
+                ORDER BY popularity DESC, movie_id DESC LIMIT 1 OFFSET %s
+            """, (skip - 1,))
+            row = cursor.fetchone()
+            if row is None:
+                break
+            after = (queries_db_script.stored_float(row[0]), row[1])
+        sql, params = queries_db_script.browse_query(limit=page_size, after=after)
+        cases.append((f"browse_keyset p{page}", sql, params))
+        cases.append((f"browse_offset p{page}", first_sql.replace("LIMIT %s", f"LIMIT %s OFFSET {skip}"), (page_size,)))
+    return cases
+
+def search_cases(cursor):
+    """query_1 / query_2 in every search mode (ngram only once its indexes exist), plus the join baseline."""
+    modes = [mode for mode in queries_db_script.SEARCH_MODES if mode != 'ngram'
+             or has_index(cursor, 'Actors', ['name'], fulltext=True, parser='ngram')]
+    cases = []
+    for query_id, values in ((1, SEARCH_KEYWORDS), (2, SEARCH_NAMES)):
+        for value in values:
+            if query_id == 2:
+                cases.append(('query_2_join', JOIN_QUERY_2_SQL, (value, value)))
+            for mode in modes:
+                sql = queries_db_script.SEARCH_SQL[query_id][mode]
+                term = queries_db_script.search_term(value, mode)
+                cases.append((f"query_{query_id}_{mode}", sql, queries_db_script.query_params(sql, term)))
+    return cases
+
+def query_cases(cursor):
+    """(query name, sql, params) for every query and sweep value."""
+    cases = []
+    for kw in KEYWORDS:
+        cases.append(('query_1', queries_db_script.QUERY_1_SQL, (kw, kw)))
+    for name in NAMES:
+        cases.append(('query_2', queries_db_script.QUERY_2_SQL, (name, name)))
+    for n in MIN_MOVIES:
+        cases.append(('query_3', queries_db_script.QUERY_3_SQL, (n,)))
+    for name in sample_actor_names(cursor):
+        cases.append(('query_4', queries_db_script.QUERY_4_SQL, (name,)))
+        cases.append(('query_4_exists', EXISTS_QUERY_4_SQL, (name,)))
+    for n in MIN_GENRES:
+        cases.append(('query_5', queries_db_script.QUERY_5_SQL, (n,)))
+    return cases + search_cases(cursor) + browse_cases(cursor)
+
+def explain(cursor, sql, params):
+    cursor.execute("EXPLAIN " + sql.strip().rstrip(';'), params)
+    columns = [c[0] for c in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def time_case(cursor, sql, params, repeats, warmup):
+    """Run one query `warmup` + `repeats` times. Returns (latencies in ms, row count)."""
+    latencies = []
+    rows = 0
+    for i in range(warmup + repeats):
+        start = time.perf_counter()
+        cursor.execute(sql, params)
+        rows = len(cursor.fetchall())
+        elapsed = (time.perf_counter() - start) * 1000
+        if i >= warmup:
+            latencies.append(elapsed)
+    return latencies, rows
+
+def environment(cursor):
+    cursor.execute("SELECT VERSION()")
+    version = cursor.fetchone()[0]
+    counts = {}
+    for table in FLUSH_ORDER:
+        cursor.execute(f"SELECT COUNT(*) FROM {table}")
+        counts[table] = cursor.fetchone()[0]
+    return {'mysql_version': version, 'table_rows': counts,
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds')}
+
+def run(repeats, warmup, label=None):
+    """Benchmark every case on a dedicated connection (the result cache is bypassed). Returns the report dict."""
+    conn = connect_direct()
+    cursor = conn.cursor()
+    try:
+        # Query cache off so repeats measure execution, not a cached result set (MySQL 5.7 and older)
+        try:
+            cursor.execute("SET SESSION query_cache_type = OFF")
+        except mysql.connector.Error:
+            pass
+        report = {'label': label, 'repeats': repeats, 'warmup': warmup, 'environment': environment(cursor), 'cases': []}
+        for name, sql, params in query_cases(cursor):
+            latencies, rows = time_case(cursor, sql, params, repeats, warmup)
+            ordered = sorted(latencies)
+            report['cases'].append({
+                'query': name,
+                'params': list(params[:1]),
+                'rows': rows,
+                'mean_ms': round(statistics.mean(ordered), 3),
+                'p50_ms': round(percentile(ordered, 50), 3),
+                'p95_ms': round(percentile(ordered, 95), 3),
+                'p99_ms': round(percentile(ordered, 99), 3),
+                'explain': explain(cursor, sql, params),
+            })
+    finally:
+        cursor.close()
+        conn.close()
+    return report
+
+def case_key(case):
+    return f"{case['query']}({', '.join(str(p) for p in case['params'])})"
+
+def print_report(report, baseline=None):
+    env = report['environment']
+    print(f"-- Query benchmark: {report['repeats']} runs per case, MySQL {env['mysql_version']}, "
+          f"{env['table_rows'].get('Movies', 0)} movies --")
+    previous = {case_key(c): c for c in baseline['cases']} if baseline else {}
+    for case in report['cases']:
+        line = (f"{case_key(case):<32} rows {case['rows']:>3} | p50 {case['p50_ms']:8.2f} ms | "
+                f"p95 {case['p95_ms']:8.2f} ms | p99 {case['p99_ms']:8.2f} ms")
+        old = previous.get(case_key(case))
+        if old and old['p50_ms']:
+            line += f" | p50 vs baseline {case['p50_ms'] / old['p50_ms']:.2f}x"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency percentiles and EXPLAIN plans for query_1..query_5.")
+    parser.add_argument('--repeats', type=int, default=50, help="Timed runs per case")
+    parser.add_argument('--warmup', type=int, default=3, help="Untimed runs per case before timing")
+    parser.add_argument('--label', help="Free-form tag stored in the report (e.g. the schema change under test)")
+    parser.add_argument('--output', help="Write the report as JSON to this file")
+    parser.add_argument('--compare', help="Baseline JSON report to compare p50 latencies against")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    try:
+        report = run(args.repeats, args.warmup, args.label)
+    except mysql.connector.Error as err:
+        print(f"Error: {err}")
+        return
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"Report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
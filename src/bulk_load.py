@@ -0,0 +1,145 @@
+import mysql.connector
+import os
+import re
+import shutil
+import tempfile
+import instrumentation
+from batch_writer import FLUSH_ORDER, TABLE_COLUMNS
+
+# Tables whose secondary / FULLTEXT indexes are dropped during a bulk load and rebuilt afterwards.
+# Link tables keep theirs: their indexes back the foreign keys.
+DEFERRED_INDEX_TABLES = ('Movies', 'Actors')
+
+def tsv_field(value):
+    """Encode one value in LOAD DATA's default format (backslash escapes, \\N for NULL)."""
+    if value is None:
+        return '\\N'
+    s = str(value)
+    return (s.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+             .replace('\r', '\\r').replace('\0', '\\0'))
+
+def get_secondary_indexes(cursor, table):
+    """Return [(name, index_type, non_unique, [columns])] for every non-primary index on `table`."""
+    cursor.execute("""
+        SELECT INDEX_NAME, INDEX_TYPE, NON_UNIQUE, COLUMN_NAME
+        FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME <> 'PRIMARY'
+        ORDER BY INDEX_NAME, SEQ_IN_INDEX
+    """, (table,))
+    indexes = {}
+    for name, index_type, non_unique, column in cursor.fetchall():
+        indexes.setdefault(name, (name, index_type, non_unique, []))[3].append(column)
+    return list(indexes.values())
+
+def fulltext_parsers(cursor, table):
+    """{index name: parser} for FULLTEXT indexes built WITH PARSER (information_schema doesn't say)."""
+    cursor.execute(f"SHOW CREATE TABLE {table}")
+    ddl = cursor.fetchone()[1]
+    return dict(re.findall(r"FULLTEXT KEY `([^`]+)` \([^)]*\)[^,\n]*?WITH PARSER `?(\w+)`?", ddl))
+
+def index_definition(index, parser=None):
+    name, index_type, non_unique, columns = index
+    cols = ", ".join(f"`{c}`" for c in columns)
+    if index_type == 'FULLTEXT':
+        return f"FULLTEXT INDEX `{name}` ({cols})" + (f" WITH PARSER {parser}" if parser else "")
+    if not non_unique:
+        return f"UNIQUE INDEX `{name}` ({cols})"
+    return f"INDEX `{name}` ({cols})"
+
+def drop_secondary_indexes(cursor, tables=DEFERRED_INDEX_TABLES):
+    """Drop the secondary indexes of `tables`. Returns {table: [(index, parser)]} for restore_indexes()."""
+    dropped = {}
+    for table in tables:
+        indexes = get_secondary_indexes(cursor, table)
+        if indexes:
+            parsers = fulltext_parsers(cursor, table)
+            cursor.execute(f"ALTER TABLE {table} " + ", ".join(f"DROP INDEX `{idx[0]}`" for idx in indexes))
+            dropped[table] = [(idx, parsers.get(idx[0])) for idx in indexes]
+            print(f"Deferred {len(indexes)} index(es) on {table}.")
+    return dropped
+
+def restore_indexes(cursor, dropped):
+    """Rebuild indexes removed by drop_secondary_indexes(). B-tree indexes share one ALTER per table."""
+    for table, indexes in dropped.items():
+        btree = [entry for entry in indexes if entry[0][1] != 'FULLTEXT']
+        # Parser-less first: a natural-language MATCH (which ignores index hints) uses the first FULLTEXT
+        # index on its columns, and that has to stay the word index rather than an ngram one
+        fulltext = sorted((entry for entry in indexes if entry[0][1] == 'FULLTEXT'), key=lambda entry: entry[1] is not None)
+        statements = []
+        if btree:
+            statements.append(f"ALTER TABLE {table} " + ", ".join(f"ADD {index_definition(*entry)}" for entry in btree))
+        # InnoDB builds only one FULLTEXT index per ALTER TABLE
+        statements.extend(f"ALTER TABLE {table} ADD {index_definition(*entry)}" for entry in fulltext)
+        for sql in statements:
+            try:
+                with instrumentation.timed('sql', f"ADD INDEX {table}"):
+                    cursor.execute(sql)
+            except mysql.connector.Error as err:
+                print(f"Error rebuilding index on {table}: {err}\nRun manually: {sql}")
+        print(f"Rebuilt {len(indexes)} index(es) on {table}.")
+
+class BulkLoader:
+    """
+    Drop-in alternative to BatchWriter for large ingests: rows are streamed into one TSV
+    file per table and loaded with LOAD DATA LOCAL INFILE by load(), in FK-safe order,
+    with secondary indexes on DEFERRED_INDEX_TABLES rebuilt after the data is in.
+    Nothing reaches the DB before load(); flush() only flushes the spool files.
+    """
+
+    def __init__(self, spool_dir=None):
+        self.spool_dir = spool_dir or tempfile.mkdtemp(prefix='tmdb_bulk_')
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self.paths = {table: os.path.join(self.spool_dir, f"{table}.tsv") for table in FLUSH_ORDER}
+        self._files = {table: open(path, 'w', encoding='utf-8', newline='\n') for table, path in self.paths.items()}
+        self.row_counts = {table: 0 for table in FLUSH_ORDER}
+        self.rows_written = 0
+        self.batches_sent = 0
+
+    def add(self, table, row):
+        self._files[table].write("\t".join(tsv_field(v) for v in row) + "\n")
+        self.row_counts[table] += 1
+
+    def flush(self):
+        for f in self._files.values():
+            f.flush()
+
+    def load(self, conn, defer_indexes=True):
+        """
+        Load every spooled table into the DB. `conn` must be opened with allow_local_infile=True.
+        Returns {table: rows loaded}.
+        """
+        for f in self._files.values():
+            f.close()
+        cursor = conn.cursor()
+        loaded = {}
+        dropped = drop_secondary_indexes(cursor) if defer_indexes else {}
+        try:
+            for table in FLUSH_ORDER:
+                if not self.row_counts[table]:
+                    continue
+                columns = ", ".join(TABLE_COLUMNS[table])
+                # IGNORE: duplicate keys (e.g. actors shared between movies) are skipped like INSERT IGNORE
+                with instrumentation.timed('sql', f"LOAD DATA {table}"):
+                    cursor.execute(f"""
+                        LOAD DATA LOCAL INFILE %s IGNORE INTO TABLE {table}
+                        CHARACTER SET utf8mb4
+                        FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+                        LINES TERMINATED BY '\\n'
+                        ({columns})
+                    """, (self.paths[table],))
+                loaded[table] = cursor.rowcount
+                self.rows_written += cursor.rowcount
+                self.batches_sent += 1
+                instrumentation.count('rows', table, cursor.rowcount)
+                with instrumentation.timed('commit', f"LOAD DATA {table}"):
+                    conn.commit()
+                print(f"Loaded {cursor.rowcount} of {self.row_counts[table]} rows into {table}.")
+        finally:
+            restore_indexes(cursor, dropped)
+            cursor.close()
+        return loaded
+
+    def cleanup(self):
+        for f in self._files.values():
+            f.close()
+        shutil.rmtree(self.spool_dir, ignore_errors=True)
@@ -0,0 +1,96 @@
+import mysql.connector
+import mysql.connector.pooling
+import os
+import sys
+import threading
+import time
+
+# Shared connection settings for all scripts
+DEFAULT_DB_USER = 'matant2'
+DEFAULT_DB_PASS = 'matant2'
+DEFAULT_DB_HOST = '127.0.0.1'
+DEFAULT_DB_PORT = 3305
+DB_NAME = 'matant2'
+CREDS_FILE = 'mysql_and_user_password.txt'
+# The pool opens all of its connections up front, so a one-shot script pays a single handshake.
+# Concurrent borrowers wait for it (see DB_POOL_WAIT); raise this for multi-threaded callers.
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 1))
+# How long get_connection() waits for a connection to come back when all are checked out
+DB_POOL_WAIT = float(os.getenv('DB_POOL_WAIT', 10.0))
+POOL_RETRY_DELAY = 0.05
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_db_config():
+    """Connection kwargs from env vars, overridden by the credentials file if present."""
+    user = os.getenv('DB_USER', DEFAULT_DB_USER)
+    password = os.getenv('DB_PASSWORD', DEFAULT_DB_PASS)
+    host = os.getenv('DB_HOST', DEFAULT_DB_HOST)
+
+    if os.path.exists(CREDS_FILE):
+        try:
+            with open(CREDS_FILE, 'r') as f:
+                content = f.read().strip().split()
+                if len(content) >= 2:
+                    user = content[0]
+                    password = content[1]
+        except Exception as e:
+            print(f"Warning: Could not read {CREDS_FILE}: {e}")
+
+    port = int(os.getenv('DB_PORT', DEFAULT_DB_PORT))
+    return {'host': host, 'port': port, 'user': user, 'password': password, 'database': DB_NAME}
+
+def get_pool(pool_size=None):
+    """Create the process-wide pool on first use and return it."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = mysql.connector.pooling.MySQLConnectionPool(
+                    pool_name='matant2_pool',
+                    pool_size=pool_size or DB_POOL_SIZE,
+                    **get_db_config()
+                )
+    return _pool
+
+def get_connection():
+    """
+    Borrow a connection from the pool. conn.close() hands it back instead of disconnecting.
+    If every connection is checked out, waits up to DB_POOL_WAIT seconds for one (the pool
+    itself fails at once). The connection is pinged on checkout and reconnected if the server
+    dropped it. Raises mysql.connector.Error if the DB is unreachable or the wait times out.
+    """
+    pool = get_pool()
+    deadline = time.monotonic() + DB_POOL_WAIT
+    while True:
+        try:
+            conn = pool.get_connection()
+            break
+        except mysql.connector.errors.PoolError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(POOL_RETRY_DELAY)
+    try:
+        conn.ping(reconnect=True, attempts=3, delay=1)
+    except mysql.connector.Error:
+        conn.close()
+        raise
+    return conn
+
+def connect_direct(**options):
+    """
+    Open a dedicated, non-pooled connection with extra connector options
+    (e.g. allow_local_infile=True for bulk loads). Raises mysql.connector.Error.
+    """
+    config = get_db_config()
+    config.update(options)
+    return mysql.connector.connect(**config)
+
+def get_db_connection():
+    """Like get_connection(), but reports the error and exits. Used by the command-line scripts."""
+    try:
+        return get_connection()
+    except mysql.connector.Error as err:
+        print(f"Error connecting to MySQL: {err}")
+        sys.exit(1)
@@ -0,0 +1,137 @@
+import os
+import threading
+
+import instrumentation
+
+# Compact "already in the DB" state for long ingests. Ids are kept as bits in a bytearray
+# indexed by id (TMDB ids are dense ints, so a million actors cost ~125 KiB), all bitmaps
+# of one ingest share a memory ceiling, and a row whose id is known is never sent to MySQL.
+DEFAULT_MAX_BYTES = int(float(os.getenv('DEDUP_MAX_MB', 64)) * 1024 * 1024)
+SEED_FETCH_SIZE = 10000 # Ids read per fetchmany() while seeding
+# Parent tables whose rows are skipped once their primary key is known; link rows are always sent
+DEDUP_COLUMNS = {'Movies': 'movie_id', 'Actors': 'actor_id', 'Producers': 'producer_id'}
+
+class MemoryBudget:
+    """Bytes the IdSets sharing it may allocate in total."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def take(self, wanted, needed):
+        """Reserve `wanted` bytes, or at least `needed` if that is all that fits. Returns the bytes reserved (0 if none)."""
+        with self._lock:
+            room = self.max_bytes - self.used
+            size = wanted if wanted <= room else needed if needed <= room else 0
+            self.used += size
+            return size
+
+class IdSet:
+    """
+    Set of non-negative int ids as a bitmap. It grows (doubling) up to the largest id added,
+    within `budget`; an id that doesn't fit is not stored, add() returns False and it is
+    counted in `overflow` (callers then fall back to sending the row).
+    """
+
+    def __init__(self, budget=None):
+        self.budget = budget if budget is not None else MemoryBudget()
+        self.bits = bytearray()
+        self.count = 0
+        self.overflow = 0
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, item):
+        index = item >> 3
+        return 0 <= index < len(self.bits) and bool(self.bits[index] & (1 << (item & 7)))
+
+    def add(self, item):
+        index = item >> 3
+        if index >= len(self.bits):
+            needed = index + 1 - len(self.bits)
+            extra = self.budget.take(max(needed, len(self.bits)), needed)
+            if not extra:
+                self.overflow += 1
+                return False
+            self.bits.extend(bytes(extra))
+        mask = 1 << (item & 7)
+        if not self.bits[index] & mask:
+            self.bits[index] |= mask
+            self.count += 1
+        return True
+
+    def update(self, items):
+        for item in items:
+            self.add(item)
+
+    def discard(self, item):
+        if item in self:
+            self.bits[item >> 3] &= ~(1 << (item & 7)) & 0xFF
+            self.count -= 1
+
+def load_ids(conn, sql, ids):
+    """Add the first column of every row of `sql` to `ids`, streamed instead of fetched all at once."""
+    cursor = conn.cursor(buffered=False)
+    try:
+        cursor.execute(sql)
+        while True:
+            rows = cursor.fetchmany(SEED_FETCH_SIZE)
+            if not rows:
+                break
+            ids.update(row[0] for row in rows)
+    finally:
+        cursor.close()
+
+class RowDedup:
+    """
+    Tracks which Movies / Actors / Producers ids are in the DB: seeded from the tables, then every
+    row this process writes. new_row() says whether a row still has to be sent. Ids written since
+    the last commit() are dropped again by rollback(), so a redone transaction resends them.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.budget = MemoryBudget(max_bytes)
+        self.ids = {table: IdSet(self.budget) for table in DEDUP_COLUMNS}
+        self.skipped = {table: 0 for table in DEDUP_COLUMNS}
+        self.pending = []
+
+    def seed(self, conn):
+        """Load the ids already stored. Streamed, so a large table is never held as Python ints."""
+        for table, column in DEDUP_COLUMNS.items():
+            load_ids(conn, f"SELECT {column} FROM {table}", self.ids[table])
+
+    def id_set(self):
+        """An empty IdSet sharing this dedup's memory ceiling (for other per-ingest id sets)."""
+        return IdSet(self.budget)
+
+    def new_row(self, table, row):
+        """False if `row`'s id is known (the row is counted as skipped), else remember it and return True."""
+        ids = self.ids.get(table)
+        if ids is None:
+            return True
+        key = row[0]
+        if key in ids:
+            self.skipped[table] += 1
+            instrumentation.count('dedup', f"skipped {table}")
+            return False
+        if ids.add(key):
+            self.pending.append((ids, key))
+        return True
+
+    def commit(self):
+        self.pending = []
+
+    def rollback(self):
+        for ids, key in self.pending:
+            ids.discard(key)
+        self.pending = []
+
+    def stats_line(self):
+        skipped = ", ".join(f"{table} {count}" for table, count in self.skipped.items())
+        known = sum(len(ids) for ids in self.ids.values())
+        overflow = sum(ids.overflow for ids in self.ids.values())
+        return (f"Dedup: {sum(self.skipped.values())} rows never sent ({skipped}), {known} ids known, "
+                f"{self.budget.used / 1024:.0f} KiB of {self.budget.max_bytes / 1024 / 1024:.0f} MiB, "
+                f"{overflow} ids past the ceiling")
@@ -0,0 +1,226 @@
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+
+import mysql.connector
+import aggregates
+import api_data_retrieve
+import instrumentation
+from api_data_retrieve import CREDITS_CONCURRENCY, get_api_key, normalize_movie
+from batch_writer import FLUSH_ORDER, PRIMARY_KEY_LENGTH, TABLE_COLUMNS, upsert_sql
+from db_connection import get_db_connection
+from migrations import pending
+from query_cache import bump_data_version
+from rate_limiter import AdaptiveRateLimiter, DEFAULT_RATE
+from sql_utils import chunks, placeholders
+from tmdb_client import TMDBClient
+
+# Re-syncs only the stored movies that TMDB lists in /movie/changes since the last refresh:
+# each is re-fetched with its credits in one request (append_to_response), the Movies /
+# Actors / Producers rows are upserted, and the link tables get only the rows that were
+# added, changed or removed. The summary tables are adjusted for the same movies, so the
+# cost follows the churn rather than the catalog size.
+SYNC_FEED = 'movie_changes'
+CHANGES_WINDOW_DAYS = 14 # Longest start_date..end_date range /movie/changes accepts
+REFRESH_BATCH_SIZE = int(os.getenv('REFRESH_BATCH_SIZE', 50)) # Movies per transaction
+LOOKUP_CHUNK = 1000 # Ids per IN (...) list
+LINK_TABLES = [table for table in FLUSH_ORDER if table.startswith('Movie_')]
+CREDIT_TABLES = {'Movie_Actors', 'Movie_Producers'}
+
+def read_synced_until(cursor):
+    cursor.execute("SELECT synced_until FROM Sync_State WHERE feed = %s", (SYNC_FEED,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def save_synced_until(cursor, day):
+    cursor.execute("INSERT INTO Sync_State (feed, synced_until) VALUES (%s, %s) "
+                   "ON DUPLICATE KEY UPDATE synced_until = VALUES(synced_until)", (SYNC_FEED, day))
+
+def change_windows(since, until):
+    """Split [since, until] into inclusive (start, end) date ranges of at most CHANGES_WINDOW_DAYS days."""
+    windows = []
+    start = since
+    while start <= until:
+        end = min(until, start + timedelta(days=CHANGES_WINDOW_DAYS - 1))
+        windows.append((start, end))
+        start = end + timedelta(days=1)
+    return windows
+
+def changed_movie_ids(client, since, until):
+    """Ids of every movie TMDB reports as changed between the two dates (inclusive)."""
+    ids = set()
+    for start, end in change_windows(since, until):
+        page = total_pages = 1
+        while page <= total_pages:
+            status, data = client.get("/movie/changes", start_date=start.isoformat(), end_date=end.isoformat(), page=page)
+            if status != 200:
+                raise RuntimeError(f"Error fetching changes {start}..{end} page {page}: {status} {data}")
+            ids.update(result['id'] for result in data.get('results', []))
+            total_pages = data.get('total_pages', 1)
+            page += 1
+    return ids
+
+def stored_movie_ids(cursor, movie_ids):
+    """The subset of `movie_ids` that is in Movies; the feed covers all of TMDB, not just our catalog."""
+    stored = set()
+    for chunk in chunks(sorted(movie_ids), LOOKUP_CHUNK):
+        cursor.execute(f"SELECT movie_id FROM Movies WHERE movie_id IN ({placeholders(chunk)})", chunk)
+        stored.update(row[0] for row in cursor.fetchall())
+    return stored
+
+def fetch_movie(client, movie_id):
+    """/movie/{id} with its credits appended; None if TMDB did not return it."""
+    status, data = client.get(f"/movie/{movie_id}", append_to_response='credits')
+    if status == 200:
+        return data
+    print(f"Warning: could not fetch movie {movie_id}: {status}")
+    return None
+
+def details_rows(details):
+    """(table, record) pairs for a /movie/{id} payload, normalized like a discover result."""
+    movie = dict(details, genre_ids=[genre['id'] for genre in details.get('genres', [])])
+    return normalize_movie(movie, details.get('credits'))
+
+def _current_links(cursor, table, movie_ids):
+    """{primary key: row} of the stored `table` rows for `movie_ids`."""
+    columns = TABLE_COLUMNS[table]
+    key_length = PRIMARY_KEY_LENGTH[table]
+    cursor.execute(f"SELECT {', '.join(columns)} FROM {table} WHERE movie_id IN ({placeholders(movie_ids)})",
+                   list(movie_ids))
+    return {tuple(row[:key_length]): tuple(row) for row in cursor.fetchall()}
+
+def _delete_links(cursor, table, keys):
+    key_columns = TABLE_COLUMNS[table][:PRIMARY_KEY_LENGTH[table]]
+    pairs = ", ".join([f"({placeholders(key_columns)})"] * len(keys))
+    cursor.execute(f"DELETE FROM {table} WHERE ({', '.join(key_columns)}) IN ({pairs})",
+                   [value for key in sorted(keys) for value in key])
+
+def apply_batch(cursor, payloads, totals):
+    """
+    Write one batch of /movie/{id} payloads: upsert the entity rows, diff the link tables and
+    move the summary tables along. The caller commits.
+    """
+    movie_ids = [details['id'] for details in payloads]
+    credited = {details['id'] for details in payloads if details.get('credits') is not None}
+    rows = {table: {} for table in FLUSH_ORDER}
+    for details in payloads:
+        for table, row in details_rows(details):
+            rows[table][tuple(row[:PRIMARY_KEY_LENGTH[table]])] = tuple(row)
+
+    current = {table: _current_links(cursor, table, movie_ids) for table in LINK_TABLES}
+    # Everyone linked before or after the change may have a different distinct genre / movie count
+    actors = {key[1] for key in current['Movie_Actors']} | {key[1] for key in rows['Movie_Actors']}
+    aggregates.remove_genre_stats(cursor, movie_ids)
+
+    for table in ('Movies', 'Actors', 'Producers'):
+        if rows[table]:
+            with instrumentation.timed('sql', f"UPSERT {table}"):
+                cursor.executemany(upsert_sql(table), [rows[table][key] for key in sorted(rows[table])])
+            totals['upserted'] += len(rows[table])
+    for table in LINK_TABLES:
+        stored = current[table]
+        if table in CREDIT_TABLES:
+            # Movies whose credits didn't come back keep the cast / producers they have
+            stored = {key: row for key, row in stored.items() if key[0] in credited}
+        stale = set(stored) - set(rows[table])
+        changed = [row for key, row in sorted(rows[table].items()) if stored.get(key) != row]
+        if stale:
+            _delete_links(cursor, table, stale)
+            totals['links_deleted'] += len(stale)
+        if changed:
+            with instrumentation.timed('sql', f"UPSERT {table}"):
+                cursor.executemany(upsert_sql(table), changed)
+            totals['links_written'] += len(changed)
+
+    aggregates.add_genre_stats(cursor, movie_ids)
+    aggregates.refresh_actor_genre_counts(cursor, actors)
+    aggregates.refresh_actor_movie_counts(cursor, actors)
+
+def fetch_batch(executor, client, movie_ids):
+    if executor is None:
+        return [fetch_movie(client, movie_id) for movie_id in movie_ids]
+    return list(executor.map(lambda movie_id: fetch_movie(client, movie_id), movie_ids))
+
+def delta_refresh(since=None, concurrency=CREDITS_CONCURRENCY, rate_limit=DEFAULT_RATE,
+                  batch_size=REFRESH_BATCH_SIZE, base_url=None):
+    """
+    Re-sync the stored movies TMDB changed from `since` (a date; default: the day after the last
+    refresh, or the last CHANGES_WINDOW_DAYS days the first time) up to today (UTC).
+    Each batch is committed on its own; the sync date only moves once every batch is in,
+    so a failed run is simply repeated. Returns a dict of totals.
+    """
+    # No response cache: the point is to see what changed
+    client = TMDBClient(get_api_key(), base_url or api_data_retrieve.TMDB_BASE_URL,
+                        limiter=AdaptiveRateLimiter(rate_limit))
+    until = datetime.now(timezone.utc).date()
+    totals = {'changed': 0, 'stored': 0, 'refreshed': 0, 'missing': 0, 'upserted': 0,
+              'links_written': 0, 'links_deleted': 0, 'requests': 0}
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    executor = ThreadPoolExecutor(max_workers=concurrency) if concurrency > 1 else None
+    try:
+        # Schema changes can rebuild whole tables, so a refresh only checks (read-only) and never applies them
+        behind = pending(cursor, defer_indexes=True)
+        if behind:
+            raise RuntimeError("The schema is missing migration(s) "
+                               f"{', '.join(f'{m.version} ({m.name})' for m in behind)}; run create_db_script.py first")
+        if since is None:
+            synced_until = read_synced_until(cursor)
+            since = synced_until + timedelta(days=1) if synced_until else until - timedelta(days=CHANGES_WINDOW_DAYS - 1)
+        # The feed is per day, so today is read again next time: changes made later today aren't lost
+        since = min(since, until)
+        print(f"Reading TMDB changes from {since} to {until}...")
+        changed = changed_movie_ids(client, since, until)
+        stored = stored_movie_ids(cursor, changed)
+        totals['changed'] = len(changed)
+        totals['stored'] = len(stored)
+        print(f"{len(changed)} movies changed on TMDB, {len(stored)} of them are in the DB.")
+
+        for batch in chunks(sorted(stored), batch_size):
+            payloads = [details for details in fetch_batch(executor, client, batch) if details is not None]
+            totals['missing'] += len(batch) - len(payloads)
+            if payloads:
+                apply_batch(cursor, payloads, totals)
+                bump_data_version(cursor)
+            with instrumentation.timed('commit', 'refresh batch'):
+                conn.commit()
+            totals['refreshed'] += len(payloads)
+            print(f"Refreshed {totals['refreshed']}/{len(stored)} movies...")
+
+        save_synced_until(cursor, until - timedelta(days=1))
+        conn.commit()
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        cursor.close()
+        conn.close()
+        totals['requests'] = client.requests
+    return totals
+
+def print_totals(totals, elapsed):
+    print(f"Refresh complete in {elapsed:.1f}s: {totals['refreshed']} movies re-synced "
+          f"({totals['missing']} not returned by TMDB) with {totals['requests']} TMDB requests. "
+          f"{totals['upserted']} rows upserted, {totals['links_written']} link rows written, "
+          f"{totals['links_deleted']} removed.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-sync the movies TMDB changed since the last refresh.")
+    parser.add_argument('--since', type=date.fromisoformat, help="Read changes from this date (YYYY-MM-DD) "
+                                                                 "instead of the last recorded refresh")
+    parser.add_argument('--concurrency', type=int, default=CREDITS_CONCURRENCY, help="Movie requests in flight at once")
+    parser.add_argument('--rate-limit', type=float, default=DEFAULT_RATE, help="Max TMDB requests per second")
+    parser.add_argument('--batch-size', type=int, default=REFRESH_BATCH_SIZE, help="Movies per transaction")
+    parser.add_argument('--profile', action='store_true', help="Time every TMDB request, SQL statement and commit")
+    args = parser.parse_args()
+    if args.profile:
+        instrumentation.enable()
+    start = time.perf_counter()
+    try:
+        print_totals(delta_refresh(args.since, args.concurrency, args.rate_limit, args.batch_size),
+                     time.perf_counter() - start)
+    except (mysql.connector.Error, RuntimeError) as err:
+        print(f"Error: {err}")
+    if instrumentation.ENABLED:
+        instrumentation.report()
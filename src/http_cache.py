@@ -0,0 +1,144 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import urlencode, urlparse
+
+DEFAULT_CACHE_FILE = os.getenv('TMDB_CACHE_FILE', 'tmdb_cache.sqlite')
+DEFAULT_MAX_BYTES = int(float(os.getenv('TMDB_CACHE_MAX_MB', 200)) * 1024 * 1024)
+
+DAY = 24 * 60 * 60
+# Time-to-live per endpoint, first match wins. Credits almost never change.
+ENDPOINT_TTLS = [
+    (re.compile(r'/genre/movie/list$'), 7 * DAY),
+    (re.compile(r'/discover/movie$'), DAY),
+    (re.compile(r'/movie/\d+/credits$'), 30 * DAY),
+]
+DEFAULT_TTL = DAY
+# Params that identify the caller rather than the resource
+UNCACHED_PARAMS = {'api_key'}
+# Hits remember their access time in memory; it is written with the next put / eviction,
+# or once this many are pending, so a hit costs no SQLite commit (fsync)
+ACCESS_FLUSH_SIZE = 1000
+
+def cache_key(url, params):
+    """URL plus sorted params, with the API key stripped."""
+    items = sorted((k, str(v)) for k, v in (params or {}).items() if k not in UNCACHED_PARAMS)
+    return f"{url}?{urlencode(items)}" if items else url
+
+def ttl_for(url):
+    path = urlparse(url).path
+    for pattern, ttl in ENDPOINT_TTLS:
+        if pattern.search(path):
+            return ttl
+    return DEFAULT_TTL
+
+class ResponseCache:
+    """
+    On-disk cache of successful TMDB JSON responses, stored zlib-compressed in SQLite.
+    Entries expire after their endpoint's TTL; once the total payload size exceeds
+    `max_bytes`, the least recently used entries are evicted. Safe to share between threads.
+    Access times of hits are batched (ACCESS_FLUSH_SIZE); close() writes the rest.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_FILE, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._accessed = {} # key -> last access not yet written
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._db.commit()
+        self.total_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, url, params):
+        """Return the cached payload for this request, or None on a miss."""
+        key = cache_key(url, params)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT body, size, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            body, size, expires_at = row
+            if expires_at <= now:
+                # Committed with the put that usually follows a miss
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._accessed.pop(key, None)
+                self.total_bytes -= size
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._accessed[key] = now
+            if len(self._accessed) >= ACCESS_FLUSH_SIZE:
+                self._flush_accesses()
+                self._db.commit()
+            self.hits += 1
+        return json.loads(zlib.decompress(body))
+
+    def put(self, url, params, payload):
+        ttl = ttl_for(url)
+        if ttl <= 0:
+            return
+        key = cache_key(url, params)
+        body = zlib.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            old = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            if old:
+                self.total_bytes -= old[0]
+            self._db.execute(
+                "REPLACE INTO responses (key, body, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, body, len(body), now + ttl, now)
+            )
+            self._accessed.pop(key, None)
+            self.total_bytes += len(body)
+            self._flush_accesses()
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+            self._db.commit()
+
+    def _flush_accesses(self):
+        if self._accessed:
+            self._db.executemany("UPDATE responses SET last_access = ? WHERE key = ?",
+                                 [(accessed, key) for key, accessed in self._accessed.items()])
+            self._accessed = {}
+
+    def _evict(self):
+        # Drop least recently used entries until we're 10% under the cap
+        target = self.max_bytes * 0.9
+        rows = self._db.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall()
+        for key, size in rows:
+            if self.total_bytes <= target:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.total_bytes -= size
+            self.evictions += 1
+
+    def stats_line(self):
+        lookups = self.hits + self.misses
+        hit_rate = 100.0 * self.hits / lookups if lookups else 0.0
+        return (f"HTTP cache: {self.hits} hits, {self.misses} misses ({hit_rate:.1f}% hit rate), "
+                f"{self.expired} expired, {self.evictions} evicted, {self.total_bytes / 1024:.0f} KiB on disk")
+
+    def close(self):
+        with self._lock:
+            self._flush_accesses()
+            self._db.commit()
+            self._db.close()
@@ -0,0 +1,241 @@
+import json
+import os
+import queue
+import threading
+import time
+import instrumentation
+from query_cache import bump_data_version
+
+DEFAULT_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', 4)) # Items buffered between two stages
+
+_DONE = object()
+
+class _StageError:
+    def __init__(self, exc):
+        self.exc = exc
+
+class StageStats:
+    """Items produced and time spent by one stage, excluding time blocked on its neighbours."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.elapsed = 0.0 # Time inside the stage, including waits on its input
+        self.input_wait = 0.0
+        self.output_wait = 0.0
+
+    @property
+    def busy(self):
+        return max(0.0, self.elapsed - self.input_wait)
+
+    def line(self):
+        rate = self.items / self.busy if self.busy else 0.0
+        return (f"{self.name:<10} {self.items:>7} items | busy {self.busy:7.2f}s ({rate:9.1f} items/s) | "
+                f"waited {self.input_wait:6.2f}s on input, {self.output_wait:6.2f}s on output")
+
+class _QueueReader:
+    """Iterates a stage's input queue, timing how long the stage sits waiting on it."""
+
+    def __init__(self, q, stats, stop):
+        self.q = q
+        self.stats = stats
+        self.stop = stop
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        while True:
+            try:
+                item = self.q.get(timeout=0.1)
+                break
+            except queue.Empty:
+                if self.stop.is_set():
+                    raise StopIteration
+            finally:
+                self.stats.input_wait += time.perf_counter() - start
+                start = time.perf_counter()
+        if item is _DONE:
+            raise StopIteration
+        if isinstance(item, _StageError):
+            raise item.exc
+        return item
+
+class Pipeline:
+    """
+    Chain of generator stages, each running on its own thread, connected by bounded queues
+    so memory stays flat no matter how much the source produces.
+
+    `source` is a zero-argument callable returning an iterator; each of `stages` is a
+    (name, fn) pair where fn takes the upstream iterator and yields downstream items.
+    consume() feeds the last stage's output to a sink callback on the calling thread.
+    `source_ready`, if given, is called before each item is taken from the source; it blocks
+    until another item is wanted and returns False to end the source. Its time counts as
+    the source's output wait, not as busy time.
+    """
+
+    def __init__(self, source, stages, queue_size=DEFAULT_QUEUE_SIZE, source_ready=None):
+        self.source = source
+        self.stages = stages
+        self.queue_size = queue_size
+        self.source_ready = source_ready
+        self.stats = [StageStats(source[0])] + [StageStats(name) for name, _ in stages] + [StageStats('sink')]
+        self._stop = threading.Event()
+        self._threads = []
+
+    def consume(self, sink):
+        """
+        Run the pipeline, calling sink(item) for every item. The sink returns False to stop early.
+        Exceptions from any stage are re-raised here.
+        """
+        queues = [queue.Queue(self.queue_size) for _ in range(len(self.stages) + 1)]
+        iterators = [iter(self.source[1]())]
+        for i, (_, fn) in enumerate(self.stages):
+            iterators.append(fn(_QueueReader(queues[i], self.stats[i + 1], self._stop)))
+        for i, it in enumerate(iterators):
+            ready = self.source_ready if i == 0 else None
+            t = threading.Thread(target=self._run, args=(self.stats[i], it, queues[i], ready), daemon=True)
+            t.start()
+            self._threads.append(t)
+
+        sink_stats = self.stats[-1]
+        try:
+            for item in _QueueReader(queues[-1], sink_stats, self._stop):
+                start = time.perf_counter()
+                keep_going = sink(item)
+                sink_stats.elapsed += time.perf_counter() - start
+                sink_stats.items += 1
+                if keep_going is False:
+                    break
+        finally:
+            self._stop.set()
+            for t in self._threads:
+                t.join()
+        # The sink's input wait is not part of its elapsed time
+        sink_stats.elapsed += sink_stats.input_wait
+
+    def stopped(self):
+        """True once consume() is finishing; a source that waits on something should give up then."""
+        return self._stop.is_set()
+
+    def _run(self, stats, iterator, out_q, ready=None):
+        try:
+            while not self._stop.is_set():
+                if ready is not None:
+                    start = time.perf_counter()
+                    wanted = ready()
+                    stats.output_wait += time.perf_counter() - start
+                    if not wanted:
+                        break
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    stats.elapsed += time.perf_counter() - start
+                stats.items += 1
+                start = time.perf_counter()
+                self._put(out_q, item)
+                stats.output_wait += time.perf_counter() - start
+        except Exception as e:
+            self._put(out_q, _StageError(e))
+            return
+        self._put(out_q, _DONE)
+
+    def _put(self, q, item):
+        # Give up once the pipeline is stopping, so a full queue can't block shutdown
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def report(self):
+        print("-- Pipeline throughput --")
+        for stats in self.stats:
+            print(stats.line())
+
+class MySQLSink:
+    """
+    Writes rows through a BatchWriter or BulkLoader; commit() makes the page durable.
+    With an aggregates.AggregateMaintainer, the summary tables are updated in the same transaction.
+    With a dedup.RowDedup, Movies / Actors / Producers rows whose id is already stored are dropped here.
+    Durable commits also bump Data_Version so cached query results get invalidated.
+    """
+
+    def __init__(self, conn, writer, durable=True, aggregates=None, dedup=None):
+        self.conn = conn
+        self.writer = writer
+        self.durable = durable
+        self.aggregates = aggregates
+        self.dedup = dedup
+        self.cursor = conn.cursor()
+
+    def begin_page(self, movie_ids):
+        """Call before adding a page's rows."""
+        if self.aggregates is not None:
+            self.aggregates.begin_page(movie_ids)
+
+    def add(self, table, row):
+        if self.dedup is not None and not self.dedup.new_row(table, row):
+            return
+        self.writer.add(table, row)
+        if self.aggregates is not None:
+            if table == 'Movie_Genres':
+                self.aggregates.note_genre(row[0], row[1])
+            elif table == 'Movie_Actors':
+                self.aggregates.note_actor(row[1])
+
+    def commit(self):
+        """Flush and commit. Returns True if the rows are now in the DB (safe to checkpoint)."""
+        self.writer.flush()
+        if self.aggregates is not None:
+            with instrumentation.timed('sql', 'summary tables'):
+                self.aggregates.apply()
+        if self.durable:
+            bump_data_version(self.cursor)
+        with instrumentation.timed('commit', 'page'):
+            self.conn.commit()
+        if self.dedup is not None:
+            self.dedup.commit()
+        return self.durable
+
+    def rollback(self):
+        """Undo the open transaction and forget its buffered rows, so the page can be added again."""
+        self.conn.rollback()
+        self.writer.discard()
+        if self.dedup is not None:
+            self.dedup.rollback()
+
+    def close(self):
+        self.commit()
+        self.cursor.close()
+
+class JSONLinesSink:
+    """Writes every row as one JSON object per line ({"table": ..., <columns>}) instead of to MySQL."""
+
+    durable = False
+
+    def __init__(self, path):
+        self.path = path
+        self.rows_written = 0
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def begin_page(self, movie_ids):
+        pass
+
+    def add(self, table, row):
+        record = {'table': table}
+        record.update(row._asdict())
+        self._file.write(json.dumps(record, default=str) + "\n")
+        self.rows_written += 1
+
+    def commit(self):
+        self._file.flush()
+        return False
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,108 @@
+import json
+import os
+import random
+import threading
+import time
+from contextlib import nullcontext
+
+# Timers and counters around the hot paths (TMDB requests, JSON decoding, SQL statements,
+# commits, queries), keyed by (category, tag) such as ('http', '/movie/{id}/credits') or
+# ('sql', 'INSERT Movies'). Off by default: timed() then hands back a shared no-op context
+# manager and count() returns immediately, so the instrumented code pays one global lookup.
+ENABLED = False
+MAX_SAMPLES = int(os.getenv('PROFILE_MAX_SAMPLES', 10000)) # Per metric, reservoir-sampled for percentiles
+
+_NULL_TIMER = nullcontext()
+_timers = {}
+_counters = {}
+_lock = threading.Lock()
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+class Metric:
+    __slots__ = ('count', 'total', 'samples')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.samples = []
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(seconds)
+        else:
+            i = random.randrange(self.count)
+            if i < MAX_SAMPLES:
+                self.samples[i] = seconds
+
+    def summary(self):
+        ordered = sorted(self.samples)
+        return {'count': self.count, 'total_s': round(self.total, 6),
+                'mean_ms': round(self.total / self.count * 1000, 3),
+                'p95_ms': round(percentile(ordered, 95) * 1000, 3)}
+
+class _Timer:
+    __slots__ = ('key', 'start')
+
+    def __init__(self, key):
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        with _lock:
+            metric = _timers.get(self.key)
+            if metric is None:
+                metric = _timers[self.key] = Metric()
+            metric.add(elapsed)
+        return False
+
+def enable():
+    global ENABLED
+    ENABLED = True
+
+def reset():
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+
+def timed(category, tag):
+    """Context manager timing one operation when profiling is on."""
+    if not ENABLED:
+        return _NULL_TIMER
+    return _Timer((category, tag))
+
+def count(category, tag, n=1):
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[(category, tag)] = _counters.get((category, tag), 0) + n
+
+def snapshot():
+    """Timers and counters as plain dicts (what dump() writes)."""
+    with _lock:
+        timers = [dict(category=c, tag=t, **metric.summary()) for (c, t), metric in sorted(_timers.items())]
+        counters = [{'category': c, 'tag': t, 'count': n} for (c, t), n in sorted(_counters.items())]
+    return {'timers': timers, 'counters': counters}
+
+def report():
+    data = snapshot()
+    print("-- Profile --")
+    print(f"{'category':<9} {'tag':<34} {'count':>8} {'total s':>9} {'mean ms':>9} {'p95 ms':>9}")
+    for t in data['timers']:
+        print(f"{t['category']:<9} {t['tag']:<34} {t['count']:>8} {t['total_s']:>9.3f} {t['mean_ms']:>9.3f} {t['p95_ms']:>9.3f}")
+    for c in data['counters']:
+        print(f"{c['category']:<9} {c['tag']:<34} {c['count']:>8}")
+
+def dump(path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot(), f, indent=2)
+    print(f"Profile written to {path}")
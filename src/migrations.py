@@ -0,0 +1,295 @@
+import argparse
+from collections import namedtuple
+
+import mysql.connector
+from aggregates import create_tables as create_aggregate_tables, rebuild_actor_movie_counts
+from bulk_load import fulltext_parsers, get_secondary_indexes
+from db_connection import get_db_connection
+from query_cache import create_version_table
+
+# Versioned schema changes. Every migration is safe to re-run (CREATE TABLE IF NOT EXISTS,
+# indexes added only if no index of that kind covers the same columns yet), and the ones
+# that only add indexes are `deferred`: with defer_indexes=True they are left pending so
+# a large initial load goes into bare tables, and a later plain run builds them.
+SCHEMA_MIGRATIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS Schema_Migrations (
+        version INT NOT NULL PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+Migration = namedtuple('Migration', ['version', 'name', 'deferred', 'apply'])
+
+BASE_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS Movies (
+        movie_id INT NOT NULL PRIMARY KEY,
+        title VARCHAR(255) NOT NULL,
+        release_date DATE,
+        popularity FLOAT,
+        vote_average FLOAT,
+        vote_count INT,
+        overview TEXT,
+        original_language VARCHAR(10)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Genres (
+        genre_id INT NOT NULL PRIMARY KEY,
+        name VARCHAR(100) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Actors (
+        actor_id INT NOT NULL PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        gender INT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Producers (
+        producer_id INT NOT NULL PRIMARY KEY,
+        name VARCHAR(255) NOT NULL
+    )
+    """,
+    # Link tables: the primary key serves movie -> X lookups, the idx_*_movie index the reverse
+    # direction. The reverse index also backs the FK, so it is never deferred.
+    """
+    CREATE TABLE IF NOT EXISTS Movie_Genres (
+        movie_id INT NOT NULL,
+        genre_id INT NOT NULL,
+        PRIMARY KEY (movie_id, genre_id),
+        INDEX idx_genre_movie (genre_id, movie_id),
+        FOREIGN KEY (movie_id) REFERENCES Movies(movie_id) ON DELETE CASCADE,
+        FOREIGN KEY (genre_id) REFERENCES Genres(genre_id) ON DELETE CASCADE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Movie_Actors (
+        movie_id INT NOT NULL,
+        actor_id INT NOT NULL,
+        character_name VARCHAR(255),
+        PRIMARY KEY (movie_id, actor_id),
+        INDEX idx_actor_movie (actor_id, movie_id),
+        FOREIGN KEY (movie_id) REFERENCES Movies(movie_id) ON DELETE CASCADE,
+        FOREIGN KEY (actor_id) REFERENCES Actors(actor_id) ON DELETE CASCADE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Movie_Producers (
+        movie_id INT NOT NULL,
+        producer_id INT NOT NULL,
+        PRIMARY KEY (movie_id, producer_id),
+        INDEX idx_producer_movie (producer_id, movie_id),
+        FOREIGN KEY (movie_id) REFERENCES Movies(movie_id) ON DELETE CASCADE,
+        FOREIGN KEY (producer_id) REFERENCES Producers(producer_id) ON DELETE CASCADE
+    )
+    """,
+]
+
+def find_index(cursor, table, columns, fulltext=False, parser=None):
+    """
+    Name of a (FULLTEXT or B-tree) index on exactly `columns`, whatever it is called, or None.
+    A FULLTEXT index must also use the same `parser` (None: the built-in one).
+    """
+    parsers = fulltext_parsers(cursor, table) if fulltext else {}
+    for name, index_type, _, index_columns in get_secondary_indexes(cursor, table):
+        if (index_columns == list(columns) and (index_type == 'FULLTEXT') == fulltext
+                and parsers.get(name) == parser):
+            return name
+    return None
+
+def has_index(cursor, table, columns, fulltext=False, parser=None):
+    return find_index(cursor, table, columns, fulltext, parser) is not None
+
+def rename_index(cursor, table, name, columns, fulltext=False, parser=None):
+    """
+    Give an existing equivalent index the name `name`, so queries can name it in an index hint
+    (older schemas have auto-named ones, e.g. FULLTEXT 'title'). Returns False if there is none.
+    """
+    current = find_index(cursor, table, columns, fulltext, parser)
+    if current is None:
+        return False
+    if current != name:
+        cursor.execute(f"ALTER TABLE {table} RENAME INDEX `{current}` TO `{name}`")
+        print(f"Index '{current}' on {table} renamed to '{name}'.")
+    return True
+
+def has_table(cursor, table):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (table,))
+    return cursor.fetchone() is not None
+
+def has_column(cursor, table, column):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    """, (table, column))
+    return cursor.fetchone() is not None
+
+def add_column(cursor, table, column, definition):
+    """Add a column unless `table` already has one of that name."""
+    if has_column(cursor, table, column):
+        return
+    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    print(f"Column '{column}' added to {table}.")
+
+def add_index(cursor, table, name, columns, fulltext=False, parser=None):
+    """
+    Add an index unless an equivalent one exists (which is renamed to `name`). Built in place so a live catalog stays readable
+    and writable (B-tree), or readable (FULLTEXT, which InnoDB can't build with LOCK=NONE).
+    `parser` names a full-text parser plugin (e.g. 'ngram').
+    """
+    if rename_index(cursor, table, name, columns, fulltext, parser):
+        return
+    kind = "FULLTEXT INDEX" if fulltext else "INDEX"
+    lock = "SHARED" if fulltext else "NONE"
+    with_parser = f" WITH PARSER {parser}" if parser else ""
+    cursor.execute(f"ALTER TABLE {table} ADD {kind} {name} ({', '.join(columns)}){with_parser}, "
+                   f"ALGORITHM=INPLACE, LOCK={lock}")
+    print(f"Index '{name}' added to {table}.")
+
+def create_base_tables(cursor):
+    for sql in BASE_TABLES:
+        cursor.execute(sql)
+
+def add_link_reverse_indexes(cursor):
+    # For link tables created before the reverse indexes were part of BASE_TABLES
+    add_index(cursor, 'Movie_Genres', 'idx_genre_movie', ['genre_id', 'movie_id'])
+    add_index(cursor, 'Movie_Actors', 'idx_actor_movie', ['actor_id', 'movie_id'])
+    add_index(cursor, 'Movie_Producers', 'idx_producer_movie', ['producer_id', 'movie_id'])
+
+def create_summary_tables(cursor):
+    create_aggregate_tables(cursor)
+    create_version_table(cursor)
+
+def create_sync_state_table(cursor):
+    # How far the delta refresh has read TMDB's changes feed (see delta_refresh.py)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS Sync_State (
+            feed VARCHAR(50) NOT NULL PRIMARY KEY,
+            synced_until DATE NOT NULL,
+            updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        )
+    """)
+
+def add_movie_indexes(cursor):
+    add_index(cursor, 'Movies', 'idx_release_date', ['release_date'])
+    add_index(cursor, 'Movies', 'idx_vote_average', ['vote_average'])
+    add_index(cursor, 'Movies', 'idx_popularity', ['popularity'])
+
+def add_name_indexes(cursor):
+    add_index(cursor, 'Actors', 'idx_actor_name', ['name'])
+    add_index(cursor, 'Producers', 'idx_producer_name', ['name'])
+
+def add_fulltext_indexes(cursor):
+    add_index(cursor, 'Movies', 'ft_title', ['title'], fulltext=True)
+    add_index(cursor, 'Actors', 'ft_actor_name', ['name'], fulltext=True)
+
+def add_actor_movie_count(cursor):
+    # Credits per actor, kept by the ingest, so query_2 ranks names without joining Movie_Actors
+    add_column(cursor, 'Actors', 'movie_count', "INT NOT NULL DEFAULT 0")
+    rebuild_actor_movie_counts(cursor)
+
+def add_ngram_indexes(cursor):
+    # Second FULLTEXT indexes on title / name, tokenized by the ngram parser: they find tokens
+    # shorter than innodb_ft_min_token_size, and substrings (search_mode='ngram' of query_1 / query_2).
+    # Created after ft_title / ft_actor_name, so a natural-language MATCH keeps using those.
+    add_index(cursor, 'Movies', 'ft_title_ngram', ['title'], fulltext=True, parser='ngram')
+    add_index(cursor, 'Actors', 'ft_actor_name_ngram', ['name'], fulltext=True, parser='ngram')
+
+# FULLTEXT indexes query_1 / query_2 name in their index hints: (table, name, columns, parser)
+FULLTEXT_INDEXES = [
+    ('Movies', 'ft_title', ['title'], None),
+    ('Actors', 'ft_actor_name', ['name'], None),
+    ('Movies', 'ft_title_ngram', ['title'], 'ngram'),
+    ('Actors', 'ft_actor_name_ngram', ['name'], 'ngram'),
+]
+
+def rename_fulltext_indexes(cursor):
+    # Schemas made before migrations 6 / 9 have these under other names; rename only, never build
+    for table, name, columns, parser in FULLTEXT_INDEXES:
+        rename_index(cursor, table, name, columns, fulltext=True, parser=parser)
+
+def add_updated_at_columns(cursor):
+    # Bumped by MySQL only when a value really changes, so the prefix index can pick up
+    # new and updated movies / actors (popularity, title, movie_count) without a full scan
+    for table in ('Movies', 'Actors'):
+        add_column(cursor, table, 'updated_at',
+                   "DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP")
+
+def add_updated_at_indexes(cursor):
+    add_index(cursor, 'Movies', 'idx_movies_updated_at', ['updated_at'])
+    add_index(cursor, 'Actors', 'idx_actors_updated_at', ['updated_at'])
+
+MIGRATIONS = [
+    Migration(1, 'base tables', False, create_base_tables),
+    Migration(2, 'link table reverse indexes', False, add_link_reverse_indexes),
+    Migration(3, 'summary and Data_Version tables', False, create_summary_tables),
+    Migration(4, 'Movies B-tree indexes', True, add_movie_indexes),
+    Migration(5, 'Actors / Producers name indexes', True, add_name_indexes),
+    Migration(6, 'FULLTEXT title / name indexes', True, add_fulltext_indexes),
+    Migration(7, 'Sync_State table', False, create_sync_state_table),
+    Migration(8, 'Actors.movie_count', False, add_actor_movie_count),
+    Migration(9, 'ngram FULLTEXT title / name indexes', True, add_ngram_indexes),
+    Migration(10, 'canonical FULLTEXT index names', False, rename_fulltext_indexes),
+    Migration(11, 'Movies / Actors updated_at', False, add_updated_at_columns),
+    Migration(12, 'updated_at indexes', True, add_updated_at_indexes),
+]
+
+def applied_versions(cursor):
+    """Versions recorded in Schema_Migrations (none before the first migrate). Read-only."""
+    if not has_table(cursor, 'Schema_Migrations'):
+        return set()
+    cursor.execute("SELECT version FROM Schema_Migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+def pending(cursor, defer_indexes=False):
+    """Migrations not applied yet. Only reads, so scripts that must not change the schema can check it."""
+    done = applied_versions(cursor)
+    return [m for m in MIGRATIONS if m.version not in done and not (defer_indexes and m.deferred)]
+
+def migrate(conn, defer_indexes=False):
+    """Apply every pending migration in version order (index-only ones skipped with defer_indexes). Returns them."""
+    cursor = conn.cursor()
+    applied = []
+    try:
+        cursor.execute(SCHEMA_MIGRATIONS_TABLE)
+        for migration in pending(cursor, defer_indexes):
+            migration.apply(cursor)
+            cursor.execute("INSERT INTO Schema_Migrations (version, name) VALUES (%s, %s)",
+                           (migration.version, migration.name))
+            conn.commit()
+            print(f"Applied migration {migration.version}: {migration.name}.")
+            applied.append(migration)
+    finally:
+        cursor.close()
+    return applied
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations.")
+    parser.add_argument('--defer-indexes', action='store_true',
+                        help="Create bare tables only; run again without this flag once the data is loaded")
+    parser.add_argument('--status', action='store_true', help="List migrations and whether they are applied")
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    try:
+        if args.status:
+            cursor = conn.cursor()
+            done = applied_versions(cursor)
+            cursor.close()
+            for m in MIGRATIONS:
+                state = "applied" if m.version in done else "pending"
+                print(f"{m.version:>3} {state:<8} {m.name}{' (index, deferrable)' if m.deferred else ''}")
+        else:
+            applied = migrate(conn, args.defer_indexes)
+            if not applied:
+                print("Schema is up to date.")
+    except mysql.connector.Error as err:
+        print(f"Error applying migrations: {err}")
+    finally:
+        conn.close()
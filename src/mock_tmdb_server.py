@@ -0,0 +1,197 @@
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# A small stand-in for the TMDB v3 API, used to benchmark the ingest scripts
+# without touching the network. Payloads are derived from the ids so every run
+# returns the same data.
+DEFAULT_PORT = 8765
+DEFAULT_LATENCY = 0.05 # Seconds added to every response
+DEFAULT_RATE_LIMIT = 0 # Requests per second before answering 429 (0 = unlimited)
+MOVIES_PER_PAGE = 20
+TOTAL_PAGES = 500
+CHANGES_PER_PAGE = 100
+
+# TMDB's movie genre list; synthetic_data uses the same ids
+GENRES = [
+    (28, 'Action'), (12, 'Adventure'), (16, 'Animation'), (35, 'Comedy'),
+    (80, 'Crime'), (99, 'Documentary'), (18, 'Drama'), (10751, 'Family'),
+    (14, 'Fantasy'), (36, 'History'), (27, 'Horror'), (10402, 'Music'),
+    (9648, 'Mystery'), (10749, 'Romance'), (878, 'Science Fiction'),
+    (10770, 'TV Movie'), (53, 'Thriller'), (10752, 'War'), (37, 'Western'),
+]
+
+def make_movie(movie_id, revision=0):
+    # `revision` counts the changes made to the movie (see start_server); 0 is the original payload
+    genre_ids = [GENRES[(movie_id + revision + k) % len(GENRES)][0] for k in range(movie_id % 3 + 1)]
+    return {
+        'id': movie_id,
+        'title': f"Movie {movie_id}",
+        'release_date': f"{1980 + movie_id % 45}-{movie_id % 12 + 1:02d}-{movie_id % 28 + 1:02d}",
+        'popularity': round(1000.0 / movie_id * (1 + revision / 10), 3),
+        'vote_average': round((movie_id * 7 + revision * 3) % 100 / 10.0, 1),
+        'vote_count': (movie_id * 13) % 5000 + revision * 10,
+        'overview': f"Overview of movie {movie_id}.",
+        'original_language': 'en' if movie_id % 4 else 'fr',
+        'genre_ids': genre_ids,
+    }
+
+def make_details(movie_id, revision=0, credits=False):
+    """/movie/{id}: the discover fields with genres as objects, plus credits if appended."""
+    movie = make_movie(movie_id, revision)
+    names = dict(GENRES)
+    movie['genres'] = [{'id': gid, 'name': names[gid]} for gid in movie.pop('genre_ids')]
+    if credits:
+        movie['credits'] = make_credits(movie_id, revision)
+    return movie
+
+def make_credits(movie_id, revision=0):
+    # Actors and producers are drawn from small pools so they repeat across movies.
+    # Each revision recasts one role.
+    cast = [
+        {
+            'id': 100000 + (movie_id * 7 + k + revision) % 2000,
+            'name': f"Actor {(movie_id * 7 + k + revision) % 2000}",
+            'gender': k % 3,
+            'character': f"Character {k}",
+        }
+        for k in range(12)
+    ]
+    crew = [
+        {'id': 500000 + (movie_id + k) % 300, 'name': f"Producer {(movie_id + k) % 300}", 'job': 'Producer'}
+        for k in range(2)
+    ]
+    crew.append({'id': 900000 + movie_id % 50, 'name': f"Director {movie_id % 50}", 'job': 'Director'})
+    return {'id': movie_id, 'cast': cast, 'crew': crew}
+
+class MockTMDBHandler(BaseHTTPRequestHandler):
+    latency = DEFAULT_LATENCY
+    rate_limit = DEFAULT_RATE_LIMIT
+    # Fixed one-second window shared by all handler threads: [window start, requests in window, 429s sent]
+    window = None
+    window_lock = None
+    # movie id -> number of changes, and the (date, movie id) log /movie/changes reads from
+    revisions = None
+    changes = None
+
+    def _throttled(self):
+        if not self.rate_limit:
+            return False
+        with self.window_lock:
+            second = int(time.time())
+            if self.window[0] != second:
+                self.window[0] = second
+                self.window[1] = 0
+            self.window[1] += 1
+            if self.window[1] > self.rate_limit:
+                self.window[2] += 1
+                return True
+        return False
+
+    def do_GET(self):
+        if self._throttled():
+            self._send(429, {'status_code': 25, 'status_message': 'Your request count is over the allowed limit.'},
+                       {'Retry-After': '1'})
+            return
+
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        parts = [p for p in url.path.split('/') if p]
+        if parts and parts[0] == '3':
+            parts = parts[1:]
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if parts == ['genre', 'movie', 'list']:
+            self._send(200, {'genres': [{'id': gid, 'name': name} for gid, name in GENRES]})
+        elif parts == ['discover', 'movie']:
+            page = int(query.get('page', ['1'])[0])
+            results = []
+            if page <= TOTAL_PAGES:
+                first = (page - 1) * MOVIES_PER_PAGE + 1
+                results = [make_movie(mid) for mid in range(first, first + MOVIES_PER_PAGE)]
+            self._send(200, {'page': page, 'results': results, 'total_pages': TOTAL_PAGES})
+        elif parts == ['movie', 'changes']:
+            self._send(200, self._changes(query))
+        elif len(parts) == 2 and parts[0] == 'movie' and parts[1].isdigit():
+            movie_id = int(parts[1])
+            appended = query.get('append_to_response', [''])[0].split(',')
+            self._send(200, make_details(movie_id, self.revisions.get(movie_id, 0), 'credits' in appended))
+        elif len(parts) == 3 and parts[0] == 'movie' and parts[2] == 'credits' and parts[1].isdigit():
+            movie_id = int(parts[1])
+            self._send(200, make_credits(movie_id, self.revisions.get(movie_id, 0)))
+        else:
+            self._send(404, {'status_message': 'The resource you requested could not be found.'})
+
+    def _changes(self, query):
+        # Dates are inclusive; like TMDB, each id is listed once however often it changed
+        start = query.get('start_date', ['0000-00-00'])[0]
+        end = query.get('end_date', ['9999-99-99'])[0]
+        page = int(query.get('page', ['1'])[0])
+        ids = sorted({movie_id for day, movie_id in list(self.changes) if start <= day <= end})
+        total_pages = max(1, -(-len(ids) // CHANGES_PER_PAGE))
+        first = (page - 1) * CHANGES_PER_PAGE
+        results = [{'id': movie_id, 'adult': False} for movie_id in ids[first:first + CHANGES_PER_PAGE]]
+        return {'results': results, 'page': page, 'total_pages': total_pages, 'total_results': len(ids)}
+
+    def _send(self, status, payload, extra_headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_server(port=0, latency=DEFAULT_LATENCY, rate_limit=DEFAULT_RATE_LIMIT):
+    """
+    Start the mock server on a background thread. With rate_limit > 0, requests beyond
+    that many per second are answered with 429 and Retry-After: 1.
+    Returns (server, base_url); call server.shutdown() when done.
+    The number of 429s sent is available as server.throttled(), and
+    server.change_movies(ids, day=None) edits those movies (ratings, genres, one cast member)
+    and lists them in /movie/changes on `day` (an ISO date, default today in UTC).
+    """
+    handler = type('Handler', (MockTMDBHandler,), {
+        'latency': latency,
+        'rate_limit': rate_limit,
+        'window': [0, 0, 0],
+        'window_lock': threading.Lock(),
+        'revisions': {},
+        'changes': [],
+    })
+
+    def change_movies(ids, day=None):
+        day = day or datetime.now(timezone.utc).date().isoformat()
+        for movie_id in ids:
+            handler.revisions[movie_id] = handler.revisions.get(movie_id, 0) + 1
+            handler.changes.append((day, movie_id))
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.throttled = lambda: handler.window[2]
+    server.change_movies = change_movies
+    return server, f"http://127.0.0.1:{server.server_address[1]}/3"
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.getenv('MOCK_TMDB_PORT', DEFAULT_PORT))
+    rate_limit = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_RATE_LIMIT
+    server, base_url = start_server(port, rate_limit=rate_limit)
+    print(f"Mock TMDB listening on {base_url} (set TMDB_BASE_URL to use it). Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
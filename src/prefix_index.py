@@ -0,0 +1,281 @@
+import argparse
+import bisect
+import heapq
+import os
+import pickle
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import timedelta
+
+import mysql.connector
+from db_connection import connect_direct
+from query_cache import read_data_version
+
+SNAPSHOT_FILE = os.getenv('PREFIX_INDEX_FILE', 'prefix_index.pickle')
+SNAPSHOT_FORMAT = 2
+# A service re-saves the snapshot once this many entries changed; a restart catches up on the rest
+SNAPSHOT_MIN_CHANGES = int(os.getenv('PREFIX_SNAPSHOT_MIN_CHANGES', 1000))
+# Rows written by a transaction still open at the last refresh carry an earlier updated_at
+REFRESH_OVERLAP = timedelta(seconds=60)
+MAX_K = 50 # Largest top-k a search can ask for
+MAX_WORD_STARTS = 6 # "Tom Hanks" is also found as "han"; only the first few words of long titles count
+SCAN_LIMIT = 256 # Prefixes matching more keys than this get their top-k cached
+TOP_CACHE_ENTRIES = int(os.getenv('PREFIX_TOP_CACHE_ENTRIES', 20000))
+
+_NON_WORD = re.compile(r'[^\w]+')
+
+def normalize(text):
+    """Lowercase, accents stripped, punctuation collapsed to single spaces."""
+    text = unicodedata.normalize('NFKD', text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return _NON_WORD.sub(' ', text.casefold()).strip()
+
+def index_keys(text):
+    """Every key an entry is reachable under: the full name and each later word start."""
+    words = normalize(text).split()
+    return {" ".join(words[i:]) for i in range(min(len(words), MAX_WORD_STARTS))}
+
+class PrefixIndex:
+    """
+    Sorted array of (key, entry id) for prefix search, with a weight per entry for ranking.
+    A prefix is a contiguous range of the array (bisect); broad prefixes keep their top MAX_K
+    ids in an LRU cache, which entries drop when an entry under them is added or reweighted.
+    Safe to search from one thread while another adds entries.
+    """
+
+    def __init__(self):
+        self.entries = {} # id -> (display text, weight)
+        self.keys = []
+        self._top = OrderedDict() # prefix -> ids, best first
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def build(self, rows):
+        """Replace the contents with (id, text, weight) rows."""
+        entries = {}
+        keys = []
+        for entry_id, text, weight in rows:
+            entries[entry_id] = (text, weight or 0)
+            keys.extend((key, entry_id) for key in index_keys(text))
+        keys.sort()
+        with self._lock:
+            self.entries = entries
+            self.keys = keys
+            self._top.clear()
+
+    def add(self, entry_id, text, weight):
+        """Insert an entry or update an existing one's text / weight. Returns False if nothing changed."""
+        weight = weight or 0
+        with self._lock:
+            old = self.entries.get(entry_id)
+            if old == (text, weight):
+                return False
+            old_keys = index_keys(old[0]) if old else set()
+            new_keys = index_keys(text)
+            for key in old_keys - new_keys:
+                i = bisect.bisect_left(self.keys, (key, entry_id))
+                if i < len(self.keys) and self.keys[i] == (key, entry_id):
+                    del self.keys[i]
+            for key in new_keys - old_keys:
+                bisect.insort(self.keys, (key, entry_id))
+            self.entries[entry_id] = (text, weight)
+            for key in old_keys | new_keys:
+                self._invalidate(key)
+        return True
+
+    def _invalidate(self, key):
+        for end in range(1, len(key) + 1):
+            self._top.pop(key[:end], None)
+
+    def _rank(self, prefix):
+        ids = self._top.get(prefix)
+        if ids is not None:
+            self._top.move_to_end(prefix)
+            return ids
+        keys = self.keys
+        i = bisect.bisect_left(keys, (prefix,))
+        matched = set()
+        scanned = 0
+        while i < len(keys) and keys[i][0].startswith(prefix):
+            matched.add(keys[i][1])
+            i += 1
+            scanned += 1
+        ids = heapq.nlargest(MAX_K, matched, key=lambda entry_id: self.entries[entry_id][1])
+        if scanned > SCAN_LIMIT:
+            self._top[prefix] = ids
+            if len(self._top) > TOP_CACHE_ENTRIES:
+                self._top.popitem(last=False)
+        return ids
+
+    def search(self, text, k=10):
+        """Top `k` (id, text, weight) whose name, or a word start within it, begins with `text`."""
+        prefix = normalize(text)
+        if not prefix:
+            return []
+        with self._lock:
+            ids = self._rank(prefix)[:min(k, MAX_K)]
+            return [(entry_id, self.entries[entry_id][0], self.entries[entry_id][1]) for entry_id in ids]
+
+    def warm(self, max_len=3):
+        """Precompute the top-k of every prefix up to `max_len` characters (the slowest ones to scan)."""
+        with self._lock:
+            for length in range(1, max_len + 1):
+                for prefix in sorted({key[:length] for key, _ in self.keys}):
+                    self._rank(prefix)
+
+    def state(self):
+        with self._lock:
+            return {'entries': self.entries, 'keys': self.keys}
+
+    def restore(self, state):
+        with self._lock:
+            self.entries = state['entries']
+            self.keys = state['keys']
+            self._top.clear()
+
+TITLE_ROWS_SQL = "SELECT movie_id, title, popularity FROM Movies"
+ACTOR_ROWS_SQL = "SELECT actor_id, name, movie_count FROM Actors"
+
+def _db_now(cursor):
+    # The server's clock, the one updated_at is set from
+    cursor.execute("SELECT NOW()")
+    return cursor.fetchone()[0]
+
+class Autocomplete:
+    """
+    Prefix search over movie titles (ranked by popularity) and actor names (ranked by movies in DB).
+    load() restores the snapshot file if there is one; refresh() then pulls in the rows whose
+    updated_at moved since the last sync, once Data_Version says something was written.
+    """
+
+    def __init__(self, snapshot_path=SNAPSHOT_FILE):
+        self.snapshot_path = snapshot_path
+        self.titles = PrefixIndex()
+        self.actors = PrefixIndex()
+        self.data_version = None
+        self.synced_at = None # DB time the last rebuild / refresh started
+        self.unsaved = 0 # Entries changed since the snapshot was written
+
+    def search(self, kind, text, k=10):
+        index = self.titles if kind == 'titles' else self.actors
+        return index.search(text, k)
+
+    def rebuild(self, cursor):
+        """Load both indexes from scratch."""
+        self.data_version = read_data_version(cursor)
+        self.synced_at = _db_now(cursor)
+        cursor.execute(TITLE_ROWS_SQL)
+        self.titles.build(cursor.fetchall())
+        cursor.execute(ACTOR_ROWS_SQL)
+        self.actors.build(cursor.fetchall())
+        self.unsaved = len(self.titles) + len(self.actors)
+
+    def refresh(self, cursor):
+        """
+        Add or update the movies and actors written since the last sync (new rows, and changed
+        titles, popularity or movie counts). Returns the number of entries that changed
+        (0 if Data_Version has not moved).
+        """
+        version = read_data_version(cursor)
+        if version == self.data_version:
+            return 0
+        now = _db_now(cursor)
+        since = self.synced_at - REFRESH_OVERLAP
+        changed = 0
+        for index, sql in ((self.titles, TITLE_ROWS_SQL), (self.actors, ACTOR_ROWS_SQL)):
+            cursor.execute(sql + " WHERE updated_at >= %s", (since,))
+            for row in cursor.fetchall():
+                changed += index.add(*row)
+        self.data_version = version
+        self.synced_at = now
+        self.unsaved += changed
+        return changed
+
+    def save_if_due(self, min_changes=SNAPSHOT_MIN_CHANGES):
+        """Save once at least `min_changes` entries changed since the last save. Returns True if it saved."""
+        if self.unsaved < min_changes:
+            return False
+        self.save()
+        return True
+
+    def save(self):
+        """Write the snapshot atomically."""
+        state = {'format': SNAPSHOT_FORMAT, 'data_version': self.data_version, 'synced_at': self.synced_at,
+                 'titles': self.titles.state(), 'actors': self.actors.state()}
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.snapshot_path)
+        self.unsaved = 0
+
+    def load(self):
+        """Restore the snapshot. Returns False if there is none (or it is from another format)."""
+        if not os.path.exists(self.snapshot_path):
+            return False
+        try:
+            with open(self.snapshot_path, 'rb') as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            print(f"Warning: could not read {self.snapshot_path}: {e}")
+            return False
+        if state.get('format') != SNAPSHOT_FORMAT:
+            return False
+        self.titles.restore(state['titles'])
+        self.actors.restore(state['actors'])
+        self.data_version = state['data_version']
+        self.synced_at = state['synced_at']
+        self.unsaved = 0
+        return True
+
+    def open(self, cursor):
+        """Startup: snapshot plus refresh when available, a full rebuild otherwise. Saves a rebuild."""
+        if self.load():
+            added = self.refresh(cursor)
+            self.save_if_due()
+        else:
+            self.rebuild(cursor)
+            added = len(self.titles)
+            self.save()
+        self.titles.warm()
+        self.actors.warm()
+        return added
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the title / actor prefix index snapshot, or try a search.")
+    parser.add_argument('--rebuild', action='store_true', help="Ignore the snapshot and load everything from the DB")
+    parser.add_argument('--search', help="Prefix to look up after loading")
+    parser.add_argument('--kind', choices=['titles', 'actors'], default='titles')
+    parser.add_argument('-k', type=int, default=10)
+    args = parser.parse_args()
+
+    index = Autocomplete()
+    start = time.perf_counter()
+    try:
+        conn = connect_direct()
+        cursor = conn.cursor()
+        if args.rebuild:
+            index.rebuild(cursor)
+            index.save()
+        else:
+            index.open(cursor)
+        cursor.close()
+        conn.close()
+    except mysql.connector.Error as err:
+        print(f"Error: {err}")
+        if not index.load():
+            raise SystemExit(1)
+        print("Using the snapshot as is.")
+    print(f"Index ready in {time.perf_counter() - start:.2f}s: {len(index.titles)} titles, {len(index.actors)} actors.")
+
+    if args.search:
+        start = time.perf_counter()
+        results = index.search(args.kind, args.search, args.k)
+        elapsed_us = (time.perf_counter() - start) * 1e6
+        for entry_id, text, weight in results:
+            print(f"{text} ({weight})")
+        print(f"{len(results)} results in {elapsed_us:.0f} us")
@@ -1,191 +1,393 @@
+import base64
+import datetime
+import json
+import re
+import struct
+from collections import namedtuple
+
 import mysql.connector
-import os
-import sys
-
-db_name = 'matant2'
-
-def get_db_connection():
-    # Similar connection logic as other scripts
-    user = os.getenv('DB_USER', 'matant2')
-    password = os.getenv('DB_PASSWORD', 'matant2')
-    host = os.getenv('DB_HOST', '127.0.0.1')
-    
-    creds_file = 'mysql_and_user_password.txt'
-    if os.path.exists(creds_file):
-        try:
-            with open(creds_file, 'r') as f:
-                content = f.read().strip().split()
-                if len(content) >= 2:
-                    user = content[0]
-                    password = content[1]
-        except:
-            pass
-
-    port = int(os.getenv('DB_PORT', 3305))
-    return mysql.connector.connect(host=host, port=port, user=user, password=password, database=db_name)
-
-def query_1(keyword):
-    """
-    Full-text search on Movies.title.
-    Returns top 10 (title, release_date) rows, ordered by best match of `keyword` to the movie title.
-    """
-    conn = get_db_connection()
+import instrumentation
+from db_connection import connect_direct, get_connection
+from query_cache import QueryCache, read_data_version
+
+# Full-text search modes of query_1 / query_2: (FULLTEXT index suffix, AGAINST modifier)
+#   natural  natural-language MATCH on the InnoDB word index (words of 3+ letters by default)
+#   boolean  every word required and prefix-matched ('Ji' finds "Ji-woo"), on the same index
+#   ngram    the same required words on the ngram-parsed index of the column (migration 9),
+#            so short tokens and substrings match too
+# Title and name each have two FULLTEXT indexes, so every mode names its index (canonical names:
+# migration 10). MySQL honours the hint for boolean mode only; a natural-language MATCH takes the
+# first FULLTEXT index on the column, which is the word index because it is always built first
+# (migration 6 before 9, and bulk_load rebuilds parser-less FULLTEXT indexes before the others).
+SEARCH_MODES = {
+    'natural': ('', 'NATURAL LANGUAGE MODE'),
+    'boolean': ('', 'BOOLEAN MODE'),
+    'ngram': ('_ngram', 'BOOLEAN MODE'),
+}
+
+def _index_hint(index, suffix):
+    return f" USE INDEX ({index}{suffix})"
+
+def query_1_sql(mode='natural'):
+    # Relevance is computed once (MySQL reuses the MATCH of the WHERE clause for the same one in
+    # the select list) and the top 10 are picked inside the derived table before anything else
+    suffix, modifier = SEARCH_MODES[mode]
+    return f"""
+    SELECT T.title, T.release_date
+    FROM (
+        SELECT M.title, M.release_date, MATCH(M.title) AGAINST (%s IN {modifier}) AS relevance
+        FROM Movies M{_index_hint('ft_title', suffix)}
+        WHERE MATCH(M.title) AGAINST (%s IN {modifier})
+        ORDER BY relevance DESC
+        LIMIT 10
+    ) T
+    ORDER BY T.relevance DESC;
+"""
+
+def query_2_sql(mode='natural'):
+    # Actors.movie_count (kept by the ingest) replaces the Movie_Actors join and GROUP BY, so the
+    # top 3 come straight off the full-text matches whatever the number of credits behind them
+    suffix, modifier = SEARCH_MODES[mode]
+    return f"""
+    SELECT T.name, T.movie_count AS movies_in_db
+    FROM (
+        SELECT A.name, A.movie_count, MATCH(A.name) AGAINST (%s IN {modifier}) AS relevance
+        FROM Actors A{_index_hint('ft_actor_name', suffix)}
+        WHERE MATCH(A.name) AGAINST (%s IN {modifier}) AND A.movie_count > 0
+        ORDER BY relevance DESC, A.movie_count DESC
+        LIMIT 3
+    ) T
+    ORDER BY T.relevance DESC, T.movie_count DESC;
+"""
+
+QUERY_1_SQL = query_1_sql()
+
+QUERY_2_SQL = query_2_sql()
+
+QUERY_3_SQL = """
+    SELECT G.name, GS.sum_rating / GS.movie_count as avg_rating, GS.movie_count
+    FROM Genre_Stats GS
+    JOIN Genres G ON G.genre_id = GS.genre_id
+    WHERE GS.movie_count >= %s
+    ORDER BY avg_rating DESC
+    LIMIT 5;
+"""
+
+# Resolves the actor through Actors.name once, then walks actor -> movies -> producers
+# via the (actor_id, movie_id) index on Movie_Actors and the primary keys of the rest.
+QUERY_4_SQL = """
+    SELECT DISTINCT P.producer_id, P.name
+    FROM Actors A
+    JOIN Movie_Actors MA ON MA.actor_id = A.actor_id
+    JOIN Movie_Producers MP ON MP.movie_id = MA.movie_id
+    JOIN Producers P ON P.producer_id = MP.producer_id
+    WHERE A.name = %s
+    LIMIT 20;
+"""
+
+QUERY_5_SQL = """
+    SELECT A.name, AGC.distinct_genres
+    FROM Actor_Genre_Counts AGC
+    JOIN Actors A ON A.actor_id = AGC.actor_id
+    WHERE AGC.distinct_genres >= %s
+    ORDER BY AGC.distinct_genres DESC
+    LIMIT 5;
+"""
+
+def _read_data_version():
+    """Current Data_Version, or None if it can't be read (caching is then skipped)."""
+    try:
+        conn = get_connection()
+    except mysql.connector.Error:
+        return None
     cursor = conn.cursor()
+    try:
+        return read_data_version(cursor)
+    except mysql.connector.Error:
+        return None
+    finally:
+        cursor.close()
+        conn.close()
 
-    query = """
-    SELECT
-        M.title,
-        M.release_date
-    FROM Movies M
-    WHERE MATCH(M.title) AGAINST (%s IN NATURAL LANGUAGE MODE)
-    ORDER BY MATCH(M.title) AGAINST (%s IN NATURAL LANGUAGE MODE) DESC
-    LIMIT 10;
-    """
+# Results of query_1..query_5 (raw row tuples), invalidated whenever an ingest bumps Data_Version
+result_cache = QueryCache(_read_data_version)
 
-    cursor.execute(query, (keyword, keyword))
-    results = cursor.fetchall()
+# Optional analytics_engine.AnalyticsEngine answering query_3 / query_5 from memory (see use_analytics_engine)
+analytics = None
 
-    if not results:
-        print(f"No movies found with title matching '{keyword}'")
-    else:
-        print(f"-- Top matches for '{keyword}' in movie titles --")
-        for title, release_date in results:
-            print(f"Title: {title} | Released: {release_date}")
+def use_analytics_engine(engine):
+    """Route query_3 / query_5 through `engine` (None goes back to SQL)."""
+    global analytics
+    analytics = engine
 
-    cursor.close()
-    conn.close()
+def run_query(query_id, sql, params, use_cache=True):
+    """Execute one of the queries above and return all rows, going through result_cache unless use_cache=False."""
+    # The SQL is part of the key: browse listings and search modes share a query_id across different statements
+    key = (query_id, sql, params)
+    if use_cache:
+        results = result_cache.get(key)
+        if results is not None:
+            instrumentation.count('query', f"cached query_{query_id}")
+            return results
 
-def query_2(keyword):
-    """
-    Full-text search on Actors.name.
-    Returns the top 3 actors whose names best match `keyword`, along with the number of distinct movies
-    they appear in our DB. Results are ordered by relevance (DESC), with ties broken by movies_in_db (DESC).
-    """
-    conn = get_db_connection()
+    conn = get_connection()
     cursor = conn.cursor()
+    try:
+        with instrumentation.timed('query', f"query_{query_id}"):
+            cursor.execute(sql, params)
+            results = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
 
-    query = """
-    SELECT
-        A.name,
-        COUNT(DISTINCT MA.movie_id) AS movies_in_db
-    FROM Actors A
-    JOIN Movie_Actors MA ON A.actor_id = MA.actor_id
-    WHERE MATCH(A.name) AGAINST (%s IN NATURAL LANGUAGE MODE)
-    GROUP BY A.actor_id, A.name
-    ORDER BY MATCH(A.name) AGAINST (%s IN NATURAL LANGUAGE MODE) DESC, movies_in_db DESC
-    LIMIT 3;
+    if use_cache:
+        result_cache.put(key, results)
+    return results
+
+class _Record:
+    """Base for the typed result rows: fields come from __slots__, values in SELECT order."""
+    __slots__ = ()
+
+    def __init__(self, *values):
+        if len(values) != len(self.__slots__):
+            raise TypeError(f"{type(self).__name__} takes {len(self.__slots__)} values, got {len(values)}")
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    def __iter__(self):
+        return (getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and tuple(self) == tuple(other)
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+class MovieMatch(_Record):
+    __slots__ = ('title', 'release_date')
+
+class ActorMatch(_Record):
+    __slots__ = ('name', 'movies_in_db')
+
+class GenreRating(_Record):
+    __slots__ = ('name', 'avg_rating', 'movie_count')
+
+class ProducerMatch(_Record):
+    __slots__ = ('producer_id', 'name')
+
+class VersatileActor(_Record):
+    __slots__ = ('name', 'distinct_genres')
+
+# query id -> (SQL, record type)
+QUERIES = {
+    1: (QUERY_1_SQL, MovieMatch),
+    2: (QUERY_2_SQL, ActorMatch),
+    3: (QUERY_3_SQL, GenreRating),
+    4: (QUERY_4_SQL, ProducerMatch),
+    5: (QUERY_5_SQL, VersatileActor),
+}
+
+# query id -> SQL per search mode, for the full-text queries
+SEARCH_SQL = {
+    1: {mode: query_1_sql(mode) for mode in SEARCH_MODES},
+    2: {mode: query_2_sql(mode) for mode in SEARCH_MODES},
+}
+
+def query_params(sql, arg):
+    # Every placeholder of a query takes the same argument (query_1/query_2 use theirs twice)
+    return (arg,) * sql.count('%s')
+
+def search_term(keyword, mode):
     """
+    The AGAINST() string for `keyword` in `mode`: unchanged for 'natural', otherwise each word
+    required (+word), and prefix-matched (word*) for 'boolean'. Boolean operators in the
+    keyword are dropped with the rest of the punctuation.
+    """
+    if mode == 'natural':
+        return keyword
+    wildcard = '*' if mode == 'boolean' else ''
+    return " ".join(f"+{word}{wildcard}" for word in re.findall(r"\w+", keyword))
 
-    cursor.execute(query, (keyword, keyword))
-    results = cursor.fetchall()
+def fetch(query_id, arg, use_cache=True, mode='natural'):
+    """
+    Run query `query_id` with its single argument and return a list of its record type.
+    `mode` picks the SEARCH_MODES variant of query_1 / query_2.
+    """
+    sql, record = QUERIES[query_id]
+    if mode != 'natural':
+        if query_id not in SEARCH_SQL or mode not in SEARCH_MODES:
+            raise ValueError(f"query_{query_id} has no search mode '{mode}'")
+        sql = SEARCH_SQL[query_id][mode]
+        arg = search_term(arg, mode)
+        query_id = f"{query_id}_{mode}"
+    return [record(*row) for row in run_query(query_id, sql, query_params(sql, arg), use_cache)]
 
-    if not results:
-        print(f"No actors found matching '{keyword}'")
-    else:
-        print(f"-- Top matches for '{keyword}' in actor names --")
-        for name, movies_in_db in results:
-            print(f"Actor: {name} | Movies in DB: {movies_in_db}")
+def stream(query_id, arg):
+    """
+    Yield records one at a time from an unbuffered cursor, for result sets too big to hold in memory.
+    Bypasses result_cache. Runs on a dedicated connection, closed when the generator finishes or
+    is closed, so an open stream never holds a pooled connection the other queries need.
+    """
+    sql, record = QUERIES[query_id]
+    conn = connect_direct()
+    cursor = conn.cursor(buffered=False)
+    try:
+        cursor.execute(sql, query_params(sql, arg))
+        for row in cursor:
+            yield record(*row)
+    finally:
+        # Stopped early: drain the rest, or closing the cursor fails on the unread result
+        conn.consume_results()
+        cursor.close()
+        conn.close()
 
-    cursor.close()
-    conn.close()
+def query_1(keyword, use_cache=True, mode='natural'):
+    """
+    Full-text search on Movies.title.
+    Returns the top 10 MovieMatch records, ordered by best match of `keyword` to the movie title.
+    `mode` is one of SEARCH_MODES ('boolean' / 'ngram' also find words shorter than the index's minimum).
+    """
+    return fetch(1, keyword, use_cache, mode)
 
+def query_2(keyword, use_cache=True, mode='natural'):
+    """
+    Full-text search on Actors.name.
+    Returns the top 3 ActorMatch records whose names best match `keyword`, with the number of distinct
+    movies they appear in our DB. Ordered by relevance (DESC), with ties broken by movies_in_db (DESC).
+    The count is Actors.movie_count; `mode` is one of SEARCH_MODES, as for query_1.
+    """
+    return fetch(2, keyword, use_cache, mode)
 
-def query_3(min_movies_count):
+def query_3(min_movies_count, use_cache=True):
     """
     Complex Query 1: Aggregation, Group By, and Join.
-    Find "High Quality" Genres. 
-    Selects genres that have at least 'min_movies_count' movies in the DB,
+    Find "High Quality" Genres.
+    Returns GenreRating records for genres that have at least 'min_movies_count' movies in the DB,
     ordered by the *average* rating (vote_average) of their movies.
+    Reads the per-genre totals kept in Genre_Stats instead of re-aggregating Movie_Genres x Movies,
+    or asks the analytics engine if one is in use.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    query = """
-    SELECT G.name, AVG(M.vote_average) as avg_rating, COUNT(M.movie_id) as movie_count
-    FROM Genres G
-    JOIN Movie_Genres MG ON G.genre_id = MG.genre_id
-    JOIN Movies M ON MG.movie_id = M.movie_id
-    GROUP BY G.name
-    HAVING movie_count >= %s
-    ORDER BY avg_rating DESC
-    LIMIT 5;
-    """
-    
-    cursor.execute(query, (min_movies_count,))
-    results = cursor.fetchall()
-    
-    print(f"-- Top Rated Genres (min {min_movies_count} movies) --")
-    for r in results:
-        # r[0]=Name, r[1]=AvgRating, r[2]=Count
-        print(f"Genre: {r[0]} | Avg Rating: {r[1]:.2f} | Movies in DB: {r[2]}")
-    
-    cursor.close()
-    conn.close()
+    if analytics is not None:
+        return analytics.query_3(min_movies_count)
+    return fetch(3, min_movies_count, use_cache)
 
-def query_4(actor_name):
+def query_4(actor_name, use_cache=True):
     """
-    Complex Query 2: Nested Query / EXISTS.
-    Find Producers who have produced a movie that features 'actor_name'.
+    Complex Query 2: Join through the reverse-lookup indexes.
+    Returns ProducerMatch records for producers who have produced a movie that features 'actor_name'.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Using EXISTS
-    query = """
-    SELECT P.name
-    FROM Producers P
-    WHERE EXISTS (
-        SELECT 1 
-        FROM Movie_Producers MP
-        JOIN Movies M ON MP.movie_id = M.movie_id
-        JOIN Movie_Actors MA ON M.movie_id = MA.movie_id
-        JOIN Actors A ON MA.actor_id = A.actor_id
-        WHERE MP.producer_id = P.producer_id
-        AND A.name = %s
-    )
-    LIMIT 20;
-    """
-    
-    cursor.execute(query, (actor_name,))
-    results = cursor.fetchall()
-    
-    print(f"-- Producers who worked with {actor_name} --")
-    if not results:
-        print("None found (or actor not found).")
-    for r in results:
-        print(r[0])
-        
-    cursor.close()
-    conn.close()
-
-def query_5(min_genres):
+    return fetch(4, actor_name, use_cache)
+
+def query_5(min_genres, use_cache=True):
     """
     Complex Query 3: Join 4 tables.
     Find "Versatile Actors".
-    Selects actors who have appeared in movies belonging to at least 'min_genres' distinct genres.
-    Ordered by the number of unique genres they have played in.
+    Returns VersatileActor records for actors who have appeared in movies belonging to at least
+    'min_genres' distinct genres, ordered by the number of unique genres they have played in.
+    Reads Actor_Genre_Counts through its distinct_genres index instead of joining 4 tables,
+    or asks the analytics engine if one is in use.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    query = """
-    SELECT A.name, COUNT(DISTINCT MG.genre_id) as distinct_genres
-    FROM Actors A
-    JOIN Movie_Actors MA ON A.actor_id = MA.actor_id
-    JOIN Movies M ON MA.movie_id = M.movie_id
-    JOIN Movie_Genres MG ON M.movie_id = MG.movie_id
-    GROUP BY A.actor_id, A.name
-    HAVING distinct_genres >= %s
-    ORDER BY distinct_genres DESC
-    LIMIT 5;
+    if analytics is not None:
+        return analytics.query_5(min_genres)
+    return fetch(5, min_genres, use_cache)
+
+# Browse listings: keyset ("seek") pagination over the indexed Movies columns. A page starts
+# strictly after the (sort value, movie_id) of the previous page's last row, so MySQL enters
+# idx_popularity / idx_vote_average / idx_release_date (which carry movie_id as their tail)
+# right where the page begins, and page 1000 costs what page 1 does. OFFSET would walk and
+# discard every earlier row instead.
+BROWSE_SORTS = {'popularity': 'popularity', 'rating': 'vote_average', 'release_date': 'release_date'}
+FLOAT_SORTS = {'popularity', 'rating'}
+BROWSE_PAGE_SIZE = 20
+MAX_BROWSE_PAGE_SIZE = 100
+CURSOR_VERSION = 1
+
+class BrowseMovie(_Record):
+    __slots__ = ('movie_id', 'title', 'release_date', 'popularity', 'vote_average', 'vote_count', 'original_language')
+
+# One page of browse_movies(); pass next_cursor back for the following page (None after the last)
+BrowsePage = namedtuple('BrowsePage', ['movies', 'next_cursor'])
+
+def stored_float(value):
+    """
+    The exact value of a FLOAT column: the connector returns the shortest decimal (7.3), which MySQL
+    compares as greater than the stored 7.30000019..., so a seek on it would repeat or skip ties.
+    """
+    return struct.unpack('f', struct.pack('f', value))[0]
+
+def encode_cursor(listing, movie):
+    """Opaque token for the page after `movie` in `listing` (sort, descending, genre_id, language)."""
+    sort = listing[0]
+    value = getattr(movie, BROWSE_SORTS[sort])
+    value = stored_float(value) if sort in FLOAT_SORTS else value.isoformat()
+    data = json.dumps({'v': CURSOR_VERSION, 'listing': list(listing), 'after': [value, movie.movie_id]})
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(token, listing):
+    """(sort value, movie_id) from a token made by encode_cursor for the same listing. Raises ValueError otherwise."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        value, movie_id = data['after']
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("invalid browse cursor")
+    if data.get('v') != CURSOR_VERSION or data.get('listing') != list(listing):
+        raise ValueError("browse cursor belongs to a different listing")
+    try:
+        value = float(value) if listing[0] in FLOAT_SORTS else datetime.date.fromisoformat(value)
+        movie_id = int(movie_id)
+    except (ValueError, TypeError):
+        raise ValueError("invalid browse cursor")
+    return value, movie_id
+
+def browse_query(sort='popularity', descending=True, genre_id=None, language=None, limit=BROWSE_PAGE_SIZE, after=None):
+    """(sql, params) for `limit` movies in `sort` order, starting after the (sort value, movie_id) `after`."""
+    if sort not in BROWSE_SORTS:
+        raise ValueError(f"sort must be one of {', '.join(BROWSE_SORTS)}")
+    column = f"M.{BROWSE_SORTS[sort]}"
+    direction, op = ('DESC', '<') if descending else ('ASC', '>')
+    # Movies without a value have no place in the order, so they are not listed
+    where = [f"{column} IS NOT NULL"]
+    params = []
+    if genre_id is not None:
+        where.append("EXISTS (SELECT 1 FROM Movie_Genres MG WHERE MG.movie_id = M.movie_id AND MG.genre_id = %s)")
+        params.append(genre_id)
+    if language is not None:
+        where.append("M.original_language = %s")
+        params.append(language)
+    if after is not None:
+        value, movie_id = after
+        where.append(f"({column} {op} %s OR ({column} = %s AND M.movie_id {op} %s))")
+        params.extend([value, value, movie_id])
+    sql = f"""
+    SELECT M.movie_id, M.title, M.release_date, M.popularity, M.vote_average, M.vote_count, M.original_language
+    FROM Movies M
+    WHERE {' AND '.join(where)}
+    ORDER BY {column} {direction}, M.movie_id {direction}
+    LIMIT %s
+"""
+    return sql, tuple(params) + (limit,)
+
+def browse_movies(sort='popularity', descending=True, genre_id=None, language=None, limit=BROWSE_PAGE_SIZE,
+                  cursor=None, use_cache=True):
+    """
+    Listing: one page of BrowseMovie records ordered by `sort` ('popularity', 'rating' or 'release_date'),
+    optionally only movies of `genre_id` and / or `original_language` = `language`.
+    Returns a BrowsePage; its next_cursor continues the same listing and stays valid while rows
+    are added, since it holds a position in the order rather than a row count.
+    Raises ValueError for an unknown sort or a cursor from another listing.
     """
-    
-    cursor.execute(query, (min_genres,))
-    results = cursor.fetchall()
-    
-    print(f"-- Versatile Actors (appearing in >= {min_genres} distinct genres) --")
-    for r in results:
-        print(f"{r[0]} (Genres: {r[1]})")
-        
-    cursor.close()
-    conn.close()
+    listing = (sort, descending, genre_id, language)
+    after = decode_cursor(cursor, listing) if cursor else None
+    limit = max(1, min(limit, MAX_BROWSE_PAGE_SIZE))
+    # One extra row tells whether another page follows
+    sql, params = browse_query(sort, descending, genre_id, language, limit + 1, after)
+    rows = run_query('browse', sql, params, use_cache)
+    movies = [BrowseMovie(*row) for row in rows[:limit]]
+    return BrowsePage(movies, encode_cursor(listing, movies[-1]) if len(rows) > limit else None)
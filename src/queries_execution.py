@@ -1,14 +1,71 @@
+import argparse
+from analytics_engine import AnalyticsEngine
+import instrumentation
 import queries_db_script
 import sys
 
+# Renderers: the query functions only return records, all printing happens here
+
+def print_query_1(keyword, results):
+    if not results:
+        print(f"No movies found with title matching '{keyword}'")
+    else:
+        print(f"-- Top matches for '{keyword}' in movie titles --")
+        for movie in results:
+            print(f"Title: {movie.title} | Released: {movie.release_date}")
+
+def print_query_2(keyword, results):
+    if not results:
+        print(f"No actors found matching '{keyword}'")
+    else:
+        print(f"-- Top matches for '{keyword}' in actor names --")
+        for actor in results:
+            print(f"Actor: {actor.name} | Movies in DB: {actor.movies_in_db}")
+
+def print_query_3(min_movies_count, results):
+    print(f"-- Top Rated Genres (min {min_movies_count} movies) --")
+    for genre in results:
+        print(f"Genre: {genre.name} | Avg Rating: {genre.avg_rating:.2f} | Movies in DB: {genre.movie_count}")
+
+def print_query_4(actor_name, results):
+    print(f"-- Producers who worked with {actor_name} --")
+    if not results:
+        print("None found (or actor not found).")
+    for producer in results:
+        print(producer.name)
+
+def print_query_5(min_genres, results):
+    print(f"-- Versatile Actors (appearing in >= {min_genres} distinct genres) --")
+    for actor in results:
+        print(f"{actor.name} (Genres: {actor.distinct_genres})")
+
+def print_browse(title, page):
+    print(f"-- {title} --")
+    for movie in page.movies:
+        print(f"{movie.title} | Released: {movie.release_date} | Popularity: {movie.popularity} | Rating: {movie.vote_average}")
+    print("(last page)" if page.next_cursor is None else f"next cursor: {page.next_cursor}")
+
 def main():
+    parser = argparse.ArgumentParser(description="Run query_1..query_5 with sample parameters.")
+    parser.add_argument('--profile', action='store_true', help="Time each query's DB round-trip")
+    parser.add_argument('--profile-json', metavar='PATH', help="Also write the profile to this JSON file (implies --profile)")
+    parser.add_argument('--engine', choices=['sql', 'numpy'], default='sql',
+                        help="Answer query_3 / query_5 with SQL or the in-memory NumPy engine")
+    parser.add_argument('--search-mode', choices=list(queries_db_script.SEARCH_MODES), default='natural',
+                        help="Full-text mode of query_1 / query_2 (ngram needs the migration 9 indexes)")
+    args = parser.parse_args()
+    if args.engine == 'numpy':
+        queries_db_script.use_analytics_engine(AnalyticsEngine())
+    if args.profile or args.profile_json:
+        instrumentation.enable()
+
     print("--- Executing Queries for Movie Database ---")
 
     # Query 1: Full text search on Movies.title (top 10)
     keyword_1 = "Star Wars"
     print(f"\n[Query 1] Full-text search in Movies.title for '{keyword_1}' (top 10 results)")
     try:
-        queries_db_script.query_1(keyword_1)
+        print_query_1(keyword_1, queries_db_script.query_1(keyword_1, mode=args.search_mode))
     except Exception as e:
         print(f"Error executing Query 1: {e}")
 
@@ -16,7 +73,7 @@ def main():
     keyword_2 = "Tom"
     print(f"\n[Query 2] Full-text search in Actors.name for '{keyword_2}' (top 3 results + movies_in_db)")
     try:
-        queries_db_script.query_2(keyword_2)
+        print_query_2(keyword_2, queries_db_script.query_2(keyword_2, mode=args.search_mode))
     except Exception as e:
         print(f"Error executing Query 2: {e}")
 
@@ -25,7 +82,7 @@ def main():
     min_movies = 100
     print(f"\n[Query 3] Top Rated Genres (min {min_movies} movies)")
     try:
-        queries_db_script.query_3(min_movies)
+        print_query_3(min_movies, queries_db_script.query_3(min_movies))
     except Exception as e:
         print(f"Error executing Query 3: {e}")
 
@@ -33,7 +90,7 @@ def main():
     actor_name = "Tom Hanks"
     print(f"\n[Query 4] Producers who worked with '{actor_name}'")
     try:
-        queries_db_script.query_4(actor_name)
+        print_query_4(actor_name, queries_db_script.query_4(actor_name))
     except Exception as e:
         print(f"Error executing Query 4: {e}")
 
@@ -41,9 +98,27 @@ def main():
     min_genres = 3
     print(f"\n[Query 5] Versatile Actors (appearing in >= {min_genres} distinct genres)")
     try:
-        queries_db_script.query_5(min_genres)
+        print_query_5(min_genres, queries_db_script.query_5(min_genres))
     except Exception as e:
         print(f"Error executing Query 5: {e}")
 
+    # Browse: keyset-paginated listing, second page continues from the first page's cursor
+    print("\n[Browse] Most popular movies, two pages of 5")
+    try:
+        page = queries_db_script.browse_movies('popularity', limit=5)
+        print_browse("Page 1", page)
+        if page.next_cursor:
+            print_browse("Page 2", queries_db_script.browse_movies('popularity', limit=5, cursor=page.next_cursor))
+    except Exception as e:
+        print(f"Error executing Browse: {e}")
+
+    print(f"\n{queries_db_script.result_cache.stats_line()}")
+    if queries_db_script.analytics is not None:
+        print(queries_db_script.analytics.stats_line())
+    if instrumentation.ENABLED:
+        instrumentation.report()
+        if args.profile_json:
+            instrumentation.dump(args.profile_json)
+
 if __name__ == "__main__":
     main()
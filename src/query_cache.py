@@ -0,0 +1,113 @@
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = int(os.getenv('QUERY_CACHE_MAX_ENTRIES', 256))
+DEFAULT_MAX_BYTES = int(float(os.getenv('QUERY_CACHE_MAX_MB', 16)) * 1024 * 1024)
+# How long a cached answer may be served before the data version is re-read from the DB
+VERSION_CHECK_INTERVAL = float(os.getenv('DATA_VERSION_CHECK_INTERVAL', 5.0))
+
+# Single-row counter bumped by every ingest commit; cached query results are tied to it.
+DATA_VERSION_TABLE = """
+    CREATE TABLE IF NOT EXISTS Data_Version (
+        id TINYINT NOT NULL PRIMARY KEY,
+        version BIGINT NOT NULL
+    )
+"""
+
+def create_version_table(cursor):
+    cursor.execute(DATA_VERSION_TABLE)
+    cursor.execute("INSERT IGNORE INTO Data_Version (id, version) VALUES (1, 0)")
+
+def bump_data_version(cursor):
+    """
+    Mark the DB contents as changed. Call inside the ingest transaction, before commit.
+    No DDL here (it would commit the transaction implicitly); migration 3 creates the table.
+    """
+    cursor.execute("INSERT INTO Data_Version (id, version) VALUES (1, 1) "
+                   "ON DUPLICATE KEY UPDATE version = version + 1")
+
+def read_data_version(cursor):
+    cursor.execute("SELECT version FROM Data_Version WHERE id = 1")
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+class QueryCache:
+    """
+    In-process LRU cache of query results keyed by (query id, params), bounded by entry
+    count and by the pickled size of the results. `version_source` returns the current
+    data version (or None if unknown); when it changes, every entry is dropped. It is
+    polled at most once per `check_interval` seconds.
+    """
+
+    def __init__(self, version_source, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES,
+                 check_interval=VERSION_CHECK_INTERVAL):
+        self.version_source = version_source
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.total_bytes = 0
+        self._entries = OrderedDict() # key -> (rows, size)
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _current_version(self):
+        now = time.monotonic()
+        if self._version is None or now - self._checked_at >= self.check_interval:
+            version = self.version_source()
+            self._checked_at = now
+            if version != self._version:
+                if self._entries:
+                    self.invalidations += 1
+                self.clear()
+                self._version = version
+        return self._version
+
+    def get(self, key):
+        """Return the cached rows for `key`, or None."""
+        with self._lock:
+            if self._current_version() is None:
+                self.misses += 1
+                return None
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, rows):
+        with self._lock:
+            if self._version is None:
+                return
+            size = len(pickle.dumps(rows, protocol=pickle.HIGHEST_PROTOCOL))
+            if size > self.max_bytes:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            self._entries[key] = (rows, size)
+            self.total_bytes += size
+            while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self.total_bytes = 0
+
+    def stats_line(self):
+        lookups = self.hits + self.misses
+        hit_rate = 100.0 * self.hits / lookups if lookups else 0.0
+        return (f"Query cache: {self.hits} hits, {self.misses} misses ({hit_rate:.1f}% hit rate), "
+                f"{len(self._entries)} entries / {self.total_bytes / 1024:.0f} KiB, "
+                f"{self.evictions} evicted, {self.invalidations} invalidations")
@@ -0,0 +1,294 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from urllib.parse import parse_qs, quote, urlsplit
+
+import mysql.connector
+from mysql.connector.aio.pooling import MySQLConnectionPool
+
+from db_connection import connect_direct, get_db_config
+from instrumentation import percentile
+from prefix_index import MAX_K, Autocomplete
+from queries_db_script import QUERIES, query_params
+
+# Long-running JSON front end for query_1..query_5:
+#   GET /query/<1-5>?arg=<value>  -> {"query": n, "arg": ..., "results": [{...}, ...]}
+#   GET /suggest?q=<prefix>&kind=titles|actors&k=10 -> prefix autocomplete
+#   GET /stats                    -> request / DB round-trip / coalescing counters
+DEFAULT_HOST = os.getenv('QUERY_SERVICE_HOST', '127.0.0.1')
+DEFAULT_PORT = int(os.getenv('QUERY_SERVICE_PORT', 8080))
+ASYNC_POOL_SIZE = int(os.getenv('ASYNC_DB_POOL_SIZE', 8))
+PREFIX_REFRESH_INTERVAL = float(os.getenv('PREFIX_REFRESH_INTERVAL', 30.0)) # Seconds between Data_Version polls
+
+# How each query's ?arg= is parsed
+ARG_TYPES = {1: str, 2: str, 3: int, 4: str, 5: int}
+
+# Parameters used by queries_execution.main, the load generator's default mix
+DEFAULT_MIX = [(1, "Star Wars"), (2, "Tom"), (3, 100), (4, "Tom Hanks"), (5, 3)]
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+class QueryService:
+    """
+    Runs the queries on an asyncio MySQL pool. Identical requests (same query and argument)
+    that arrive while one is already running wait for that one's result instead of querying again.
+    """
+
+    def __init__(self, pool_size=ASYNC_POOL_SIZE):
+        self.pool_size = pool_size
+        self.pool = None
+        self.slots = asyncio.Semaphore(pool_size) # The aio pool raises instead of waiting when empty
+        self.inflight = {} # (query id, arg) -> task
+        self.requests = 0
+        self.db_queries = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.autocomplete = Autocomplete()
+        self._refresher = None
+
+    async def start(self):
+        self.pool = MySQLConnectionPool(pool_size=self.pool_size, pool_name='matant2_async_pool', **get_db_config())
+        await self.pool.initialize_pool()
+        # The prefix index loads with the blocking connector, off the event loop
+        await asyncio.to_thread(self._sync_autocomplete, self.autocomplete.open)
+        self._refresher = asyncio.ensure_future(self._refresh_autocomplete())
+
+    async def close(self):
+        if self._refresher is not None:
+            self._refresher.cancel()
+        if self.autocomplete.unsaved:
+            await asyncio.to_thread(self.autocomplete.save)
+        if self.pool is not None:
+            await self.pool.close_pool()
+
+    def _sync_autocomplete(self, method):
+        conn = connect_direct()
+        try:
+            cursor = conn.cursor()
+            added = method(cursor)
+            cursor.close()
+        finally:
+            conn.close()
+        return added
+
+    async def _refresh_autocomplete(self):
+        """Pick up movies and actors written by ingests / refreshes, re-saving the snapshot every so many changes."""
+        while True:
+            await asyncio.sleep(PREFIX_REFRESH_INTERVAL)
+            try:
+                if await asyncio.to_thread(self._sync_autocomplete, self.autocomplete.refresh):
+                    await asyncio.to_thread(self.autocomplete.save_if_due)
+            except (mysql.connector.Error, OSError) as err:
+                print(f"Warning: prefix index refresh failed: {err}")
+
+    async def _execute(self, query_id, arg):
+        sql, record = QUERIES[query_id]
+        async with self.slots:
+            conn = await self.pool.get_connection()
+            try:
+                cursor = await conn.cursor()
+                try:
+                    await cursor.execute(sql, query_params(sql, arg))
+                    rows = await cursor.fetchall()
+                finally:
+                    await cursor.close()
+            finally:
+                await conn.close()
+        self.db_queries += 1
+        return [record(*row).as_dict() for row in rows]
+
+    async def run(self, query_id, arg):
+        """Results of query `query_id` as a list of dicts, sharing the DB round-trip with identical in-flight calls."""
+        key = (query_id, arg)
+        task = self.inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._execute(query_id, arg))
+            self.inflight[key] = task
+            task.add_done_callback(lambda _: self.inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # shield: one caller disconnecting must not cancel the query for the others
+        return await asyncio.shield(task)
+
+    def stats(self):
+        return {'requests': self.requests, 'db_queries': self.db_queries, 'coalesced': self.coalesced,
+                'errors': self.errors, 'in_flight': len(self.inflight), 'pool_size': self.pool_size}
+
+    def suggest(self, query):
+        """Prefix search; answered from memory without touching the DB."""
+        text = query.get('q', [''])[0]
+        kind = query.get('kind', ['titles'])[0]
+        if kind not in ('titles', 'actors'):
+            return 400, {'error': "kind must be titles or actors"}
+        try:
+            k = min(int(query.get('k', ['10'])[0]), MAX_K)
+        except ValueError:
+            return 400, {'error': "k must be an integer"}
+        self.requests += 1
+        results = [{'id': entry_id, 'text': match, 'weight': weight}
+                   for entry_id, match, weight in self.autocomplete.search(kind, text, k)]
+        return 200, {'q': text, 'kind': kind, 'results': results}
+
+    async def dispatch(self, method, target):
+        """Returns (status, payload) for one request."""
+        if method != 'GET':
+            return 405, {'error': f"{method} not allowed"}
+        url = urlsplit(target)
+        if url.path == '/stats':
+            return 200, self.stats()
+        if url.path == '/suggest':
+            return self.suggest(parse_qs(url.query))
+        parts = url.path.strip('/').split('/')
+        if len(parts) != 2 or parts[0] != 'query' or not parts[1].isdigit() or int(parts[1]) not in QUERIES:
+            return 404, {'error': f"unknown path {url.path}", 'paths': ['/query/<1-5>?arg=...', '/suggest?q=...', '/stats']}
+        query_id = int(parts[1])
+        values = parse_qs(url.query).get('arg')
+        if not values:
+            return 400, {'error': "missing ?arg="}
+        try:
+            arg = ARG_TYPES[query_id](values[0])
+        except ValueError:
+            return 400, {'error': f"query {query_id} takes an integer arg"}
+
+        self.requests += 1
+        try:
+            results = await self.run(query_id, arg)
+        except mysql.connector.Error as err:
+            self.errors += 1
+            return 500, {'error': str(err)}
+        return 200, {'query': query_id, 'arg': arg, 'results': results}
+
+    async def handle(self, reader, writer):
+        """One client connection; HTTP/1.1 keep-alive is honoured."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._respond(writer, 400, {'error': "malformed request line"}, keep_alive=False)
+                    break
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                status, payload = await self.dispatch(method, target)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, default=str).encode('utf-8')
+        head = (f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+async def serve(host, port, pool_size):
+    service = QueryService(pool_size)
+    try:
+        await service.start()
+    except mysql.connector.Error as err:
+        print(f"Error connecting to MySQL: {err}")
+        return
+    server = await asyncio.start_server(service.handle, host, port)
+    print(f"Query service on http://{host}:{port} (DB pool of {pool_size}). Ctrl+C to stop.")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+# --- Load generator ---
+
+async def _get(reader, writer, host, path):
+    """One keep-alive GET. Returns (status, body bytes)."""
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode('latin-1'))
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if not line.strip():
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+async def _client(host, port, paths, offset, deadline, latencies, failures):
+    reader, writer = await asyncio.open_connection(host, port)
+    i = offset
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status, _ = await _get(reader, writer, host, paths[i % len(paths)])
+            latencies.append((time.perf_counter() - start) * 1000)
+            if status != 200:
+                failures.append(status)
+            i += 1
+    finally:
+        writer.close()
+
+async def load_test(host, port, concurrency, duration, mix=DEFAULT_MIX):
+    """Keep `concurrency` connections busy for `duration` seconds, cycling through `mix`. Prints throughput and latency."""
+    paths = [f"/query/{query_id}?arg={quote(str(arg))}" for query_id, arg in mix]
+    latencies = []
+    failures = []
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*(_client(host, port, paths, i, deadline, latencies, failures) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    reader, writer = await asyncio.open_connection(host, port)
+    _, body = await _get(reader, writer, host, '/stats')
+    writer.close()
+    stats = json.loads(body)
+
+    ordered = sorted(latencies)
+    print(f"-- Load test: {concurrency} connections for {elapsed:.1f}s --")
+    print(f"Requests: {len(ordered)} ({len(ordered) / elapsed:.0f} req/s), non-200: {len(failures)}")
+    if ordered:
+        print(f"Latency p50 {percentile(ordered, 50):.2f} ms | p95 {percentile(ordered, 95):.2f} ms | "
+              f"p99 {percentile(ordered, 99):.2f} ms")
+    print(f"Service totals: {stats['requests']} requests, {stats['db_queries']} DB queries, {stats['coalesced']} coalesced")
+
+def main():
+    parser = argparse.ArgumentParser(description="Async HTTP/JSON service for query_1..query_5, plus a load generator.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    serve_cmd = sub.add_parser('serve', help="Run the service")
+    serve_cmd.add_argument('--pool-size', type=int, default=ASYNC_POOL_SIZE, help="Async MySQL connections")
+    load_cmd = sub.add_parser('load', help="Measure req/s and latency of a running service")
+    load_cmd.add_argument('--concurrency', type=int, default=50, help="Concurrent keep-alive connections")
+    load_cmd.add_argument('--duration', type=float, default=10.0, help="Seconds to run")
+    for cmd in (serve_cmd, load_cmd):
+        cmd.add_argument('--host', default=DEFAULT_HOST)
+        cmd.add_argument('--port', type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'serve':
+            asyncio.run(serve(args.host, args.port, args.pool_size))
+        else:
+            asyncio.run(load_test(args.host, args.port, args.concurrency, args.duration))
+    except KeyboardInterrupt:
+        pass
+    except ConnectionError as err:
+        print(f"Error: {err}")
+
+if __name__ == "__main__":
+    main()
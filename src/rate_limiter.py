@@ -0,0 +1,88 @@
+import multiprocessing
+import os
+import threading
+import time
+
+DEFAULT_RATE = float(os.getenv('TMDB_RATE_LIMIT', 40)) # Requests per second
+MIN_RATE = 1.0
+DECREASE_FACTOR = 0.5 # Multiplicative decrease on every 429
+INCREASE_STEP = 0.1 # Additive increase (req/s) per successful request
+
+class AdaptiveRateLimiter:
+    """
+    Client-side token bucket shared by every thread talking to TMDB.
+    The refill rate starts at `rate`, is halved whenever TMDB answers 429 and creeps back
+    up by INCREASE_STEP per successful request (AIMD), so we settle just under the quota.
+    A Retry-After from the server blocks all callers until it has passed.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=None, min_rate=MIN_RATE):
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def on_success(self):
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + INCREASE_STEP)
+
+    def on_throttle(self, retry_after=None):
+        """Record a 429. `retry_after` is the server's Retry-After in seconds, if it sent one."""
+        with self._lock:
+            now = time.monotonic()
+            self.throttled += 1
+            self.rate = max(self.min_rate, self.rate * DECREASE_FACTOR)
+            self.tokens = 0
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+            # Start refilling only once any Retry-After pause is over
+            self.updated = max(now, self.blocked_until)
+
+    def stats_line(self):
+        return f"Rate limiter: {self.throttled} throttled responses, current rate {self.rate:.1f}/{self.max_rate:.1f} req/s"
+
+class SharedRateLimiter(AdaptiveRateLimiter):
+    """
+    AdaptiveRateLimiter whose bucket lives in shared memory, so worker processes started
+    with it draw on one global rate budget and a 429 seen by any of them slows down all.
+    Create it in the parent and pass it to the workers when starting them.
+    """
+
+    _FIELDS = ('rate', 'tokens', 'updated', 'blocked_until', 'throttled')
+
+    def __init__(self, rate=DEFAULT_RATE, burst=None, min_rate=MIN_RATE):
+        self._shared = multiprocessing.RawArray('d', len(self._FIELDS))
+        super().__init__(rate, burst, min_rate)
+        self._lock = multiprocessing.Lock()
+
+def _shared_field(index, cast):
+    def get(self):
+        return cast(self._shared[index])
+    def set(self, value):
+        self._shared[index] = value
+    return property(get, set)
+
+for _index, _name in enumerate(SharedRateLimiter._FIELDS):
+    setattr(SharedRateLimiter, _name, _shared_field(_index, int if _name == 'throttled' else float))
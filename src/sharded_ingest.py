@@ -0,0 +1,198 @@
+import argparse
+import multiprocessing
+import os
+import queue
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import mysql.connector
+import aggregates
+import api_data_retrieve
+from api_data_retrieve import (CREDITS_CONCURRENCY, MAX_PAGES, credits_stage, discover_pages, get_api_key, repair_credits,
+                               normalize_stage)
+from batch_writer import BatchWriter, DEFAULT_BATCH_SIZE, Genre, LOCK_ERRNOS
+from db_connection import connect_direct
+from dedup import RowDedup
+from ingest_pipeline import Pipeline, MySQLSink
+from query_cache import bump_data_version
+from rate_limiter import DEFAULT_RATE, SharedRateLimiter
+from tmdb_client import TMDBClient
+
+# Runs the ingest as several worker processes, each owning a contiguous slice of the
+# discover pages, its own TMDB client and its own DB connection. All of them draw on one
+# SharedRateLimiter. Shared actors / producers are written with INSERT IGNORE in
+# primary-key order, and a page that hits a deadlock is rolled back and written again.
+DEFAULT_WORKERS = int(os.getenv('INGEST_WORKERS', os.cpu_count() or 2))
+PAGE_RETRIES = 5 # Attempts per page on deadlock / lock wait timeout
+RESULT_POLL_INTERVAL = 1.0 # Seconds between checks for workers that died without reporting
+
+def shard_pages(first_page, last_page, workers):
+    """Split [first_page, last_page] into at most `workers` contiguous (first, last) ranges."""
+    pages = last_page - first_page + 1
+    workers = max(1, min(workers, pages))
+    size, extra = divmod(pages, workers)
+    shards = []
+    start = first_page
+    for i in range(workers):
+        end = start + size + (1 if i < extra else 0) - 1
+        shards.append((start, end))
+        start = end + 1
+    return shards
+
+def load_genres(client):
+    """Genres go in once, before the workers start, so every Movie_Genres row has its parent."""
+    status, data = client.get("/genre/movie/list")
+    if status != 200:
+        print(f"Failed to fetch genres: {status}")
+        return
+    conn = connect_direct()
+    cursor = conn.cursor()
+    writer = BatchWriter(cursor)
+    for g in data.get('genres', []):
+        writer.add('Genres', Genre(g['id'], g['name']))
+    writer.flush()
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+def write_page_with_retry(sink, batch):
+    """Add a page's rows and commit, redoing the whole page if InnoDB picks it as a deadlock victim."""
+    for attempt in range(PAGE_RETRIES):
+        try:
+            for table, row in batch.rows:
+                sink.add(table, row)
+            sink.commit()
+            return attempt
+        except mysql.connector.Error as err:
+            if err.errno not in LOCK_ERRNOS or attempt == PAGE_RETRIES - 1:
+                raise
+            sink.rollback()
+            time.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+
+def shard_totals(shard_id, error=None):
+    return {'shard': shard_id, 'pages': 0, 'movies': 0, 'rows': 0, 'skipped': 0, 'requests': 0, 'retried_pages': 0,
+            'uncredited': 0, 'seconds': 0.0, 'error': error}
+
+def run_shard(shard_id, first_page, last_page, limiter, base_url, concurrency, batch_size, results):
+    """Worker process: ingest discover pages first_page..last_page and report its totals on `results`."""
+    start = time.perf_counter()
+    totals = shard_totals(shard_id)
+    client = TMDBClient(get_api_key(), base_url, limiter=limiter)
+    executor = ThreadPoolExecutor(max_workers=concurrency) if concurrency > 1 else None
+    conn = None
+    try:
+        conn = connect_direct()
+        writer = BatchWriter(conn.cursor(), batch_size)
+        # Each worker only knows the ids stored at its start and the ones it writes itself;
+        # rows another worker wrote meanwhile still go through INSERT IGNORE
+        dedup = RowDedup()
+        dedup.seed(conn)
+        # Summary tables are rebuilt once by the coordinator; incremental upkeep would race between workers
+        sink = MySQLSink(conn, writer, dedup=dedup)
+
+        failed_credits = []
+
+        def write_page(batch):
+            if write_page_with_retry(sink, batch):
+                totals['retried_pages'] += 1
+            totals['pages'] += 1
+            totals['movies'] += len(batch.movie_ids)
+
+        pipeline = Pipeline(
+            ('discover', lambda: discover_pages(client, first_page, last_page)),
+            [('credits', credits_stage(client, executor, set(), failed_credits)), ('normalize', normalize_stage)],
+        )
+        pipeline.consume(write_page)
+        # The shard's movies are stored even when their credits failed; give those one more try
+        totals['uncredited'] = len(repair_credits(client, executor, sink, failed_credits))
+        sink.close()
+        totals['rows'] = writer.rows_written
+        totals['skipped'] = sum(dedup.skipped.values())
+    except Exception as e:
+        totals['error'] = f"{type(e).__name__}: {e}"
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if conn is not None:
+            conn.close()
+        totals['requests'] = client.requests
+        totals['seconds'] = time.perf_counter() - start
+        # Always report; only a worker killed outright (OOM, SIGKILL) gets here without doing so
+        results.put(totals)
+
+def collect_totals(processes, results):
+    """
+    The totals of every shard, in shard order. A worker that exits without reporting (killed
+    before its finally ran) is recorded as failed instead of being waited on forever.
+    """
+    totals = {}
+    while len(totals) < len(processes):
+        try:
+            reported = results.get(timeout=RESULT_POLL_INTERVAL)
+            totals[reported['shard']] = reported
+        except queue.Empty:
+            # Exit code 0 means the result is still on its way through the pipe
+            for shard_id, p in enumerate(processes):
+                if shard_id not in totals and not p.is_alive() and p.exitcode != 0:
+                    totals[shard_id] = shard_totals(shard_id, f"worker exited with code {p.exitcode} without reporting")
+    return [totals[shard_id] for shard_id in sorted(totals)]
+
+def sharded_ingest(workers=DEFAULT_WORKERS, first_page=1, last_page=MAX_PAGES, rate_limit=DEFAULT_RATE,
+                   concurrency=CREDITS_CONCURRENCY, batch_size=DEFAULT_BATCH_SIZE, base_url=None):
+    """
+    Ingest discover pages first_page..last_page with `workers` processes sharing a `rate_limit` req/s budget,
+    then rebuild the summary tables. Returns (seconds, [per-shard totals]).
+    """
+    base_url = base_url or api_data_retrieve.TMDB_BASE_URL
+    limiter = SharedRateLimiter(rate_limit)
+    start = time.perf_counter()
+    load_genres(TMDBClient(get_api_key(), base_url, limiter=limiter))
+
+    results = multiprocessing.Queue()
+    processes = []
+    for shard_id, (first, last) in enumerate(shard_pages(first_page, last_page, workers)):
+        p = multiprocessing.Process(target=run_shard, name=f"shard-{shard_id}",
+                                    args=(shard_id, first, last, limiter, base_url, concurrency, batch_size, results))
+        p.start()
+        processes.append(p)
+    # Drain before join: a child can't exit while its result is still in the queue's pipe
+    totals = collect_totals(processes, results)
+    for p in processes:
+        p.join()
+
+    conn = connect_direct()
+    cursor = conn.cursor()
+    aggregates.rebuild(cursor)
+    bump_data_version(cursor)
+    conn.commit()
+    cursor.close()
+    conn.close()
+    elapsed = time.perf_counter() - start
+    print(limiter.stats_line())
+    return elapsed, totals
+
+def print_totals(elapsed, totals):
+    movies = sum(t['movies'] for t in totals)
+    for t in totals:
+        status = f" | failed: {t['error']}" if t['error'] else ""
+        if t['uncredited']:
+            status += f" | {t['uncredited']} movies without credits"
+        print(f"Shard {t['shard']}: {t['pages']} pages, {t['movies']} movies, {t['rows']} rows ({t['skipped']} deduplicated), "
+              f"{t['requests']} requests in {t['seconds']:.1f}s ({t['retried_pages']} pages retried){status}")
+    print(f"Total: {movies} movies in {elapsed:.1f}s ({movies / elapsed:.1f} movies/s) with {len(totals)} workers")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Populate the movie DB from TMDB with several worker processes.")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="Worker processes")
+    parser.add_argument('--first-page', type=int, default=1)
+    parser.add_argument('--last-page', type=int, default=MAX_PAGES)
+    parser.add_argument('--rate-limit', type=float, default=DEFAULT_RATE, help="Global max TMDB requests per second")
+    parser.add_argument('--concurrency', type=int, default=CREDITS_CONCURRENCY, help="Credits requests in flight per worker")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Rows per multi-row INSERT")
+    args = parser.parse_args()
+    try:
+        print_totals(*sharded_ingest(args.workers, args.first_page, args.last_page, args.rate_limit,
+                                     args.concurrency, args.batch_size))
+    except mysql.connector.Error as err:
+        print(f"Error: {err}")
@@ -0,0 +1,288 @@
+import argparse
+import datetime
+import itertools
+import json
+import os
+import sys
+import time
+import zipfile
+from array import array
+
+import mysql.connector
+import aggregates
+from batch_writer import FLUSH_ORDER, PRIMARY_KEY_LENGTH, TABLE_COLUMNS
+from bulk_load import BulkLoader
+from create_db_script import create_database
+from db_connection import connect_direct
+from migrations import migrate
+from query_cache import bump_data_version
+
+# Offline copy of the whole catalog: a zip with one member per column part and a manifest.
+# Columns are typed arrays (ids delta-encoded, since they are exported in key order),
+# low-cardinality strings are dictionary-encoded, and everything is deflated.
+SNAPSHOT_VERSION = 1
+MANIFEST = 'manifest.json'
+
+# Encoding per column, in TABLE_COLUMNS order
+COLUMN_ENCODINGS = {
+    'Genres': ('delta', 'dict'),
+    'Movies': ('delta', 'str', 'date', 'float', 'float', 'int', 'str', 'dict'),
+    'Actors': ('delta', 'str', 'int'),
+    'Producers': ('delta', 'str'),
+    'Movie_Genres': ('delta', 'int'),
+    'Movie_Actors': ('delta', 'int', 'dict'),
+    'Movie_Producers': ('delta', 'int'),
+}
+
+class _IntColumn:
+    def __init__(self, delta=False):
+        self.delta = delta
+        self.values = array('q')
+        self.nulls = array('I')
+        self.rows = 0
+        self.previous = 0
+
+    def append(self, value):
+        if value is None:
+            self.nulls.append(self.rows)
+            value = self.previous if self.delta else 0
+        if self.delta:
+            self.values.append(value - self.previous)
+            self.previous = value
+        else:
+            self.values.append(value)
+        self.rows += 1
+
+    def parts(self):
+        return {'values': self.values.tobytes(), 'nulls': self.nulls.tobytes()}
+
+class _DateColumn(_IntColumn):
+    def append(self, value):
+        super().append(value.toordinal() if value is not None else None)
+
+class _FloatColumn:
+    def __init__(self):
+        self.values = array('f') # The schema's FLOAT columns are single precision
+        self.nulls = array('I')
+
+    def append(self, value):
+        if value is None:
+            self.nulls.append(len(self.values))
+            value = 0.0
+        self.values.append(value)
+
+    def parts(self):
+        return {'values': self.values.tobytes(), 'nulls': self.nulls.tobytes()}
+
+class _StrColumn:
+    def __init__(self):
+        self.lengths = array('I')
+        self.blob = bytearray()
+        self.nulls = array('I')
+
+    def append(self, value):
+        if value is None:
+            self.nulls.append(len(self.lengths))
+            value = ''
+        data = value.encode('utf-8')
+        self.lengths.append(len(data))
+        self.blob += data
+
+    def parts(self):
+        return {'lengths': self.lengths.tobytes(), 'blob': bytes(self.blob), 'nulls': self.nulls.tobytes()}
+
+class _DictColumn:
+    def __init__(self):
+        self.codes = array('I')
+        self.lookup = {}
+        self.dictionary = _StrColumn()
+
+    def append(self, value):
+        # NULL gets a code of its own, like any other value
+        code = self.lookup.get(value)
+        if code is None:
+            code = self.lookup[value] = len(self.lookup)
+            self.dictionary.append(value)
+        self.codes.append(code)
+
+    def parts(self):
+        dictionary = self.dictionary.parts()
+        return {'codes': self.codes.tobytes(), 'dict_lengths': dictionary['lengths'],
+                'dict_blob': dictionary['blob'], 'dict_nulls': dictionary['nulls']}
+
+def new_column(encoding):
+    if encoding in ('delta', 'int'):
+        return _IntColumn(delta=encoding == 'delta')
+    return {'date': _DateColumn, 'float': _FloatColumn, 'str': _StrColumn, 'dict': _DictColumn}[encoding]()
+
+def _array(typecode, data, byteorder):
+    values = array(typecode)
+    values.frombytes(data)
+    if byteorder != sys.byteorder:
+        values.byteswap()
+    return values
+
+def _with_nulls(values, nulls):
+    if not nulls:
+        return iter(values)
+    nulls = set(nulls)
+    return (None if i in nulls else v for i, v in enumerate(values))
+
+def _decode_str(lengths, blob, nulls):
+    def strings():
+        offset = 0
+        for length in lengths:
+            yield blob[offset:offset + length].decode('utf-8')
+            offset += length
+    return _with_nulls(strings(), nulls)
+
+def decode_column(encoding, part, byteorder):
+    """Iterator over one column's values; `part(name)` returns the bytes of that part."""
+    if encoding in ('delta', 'int', 'date'):
+        values = _array('q', part('values'), byteorder)
+        if encoding == 'delta':
+            values = itertools.accumulate(values)
+        nulls = _array('I', part('nulls'), byteorder)
+        if encoding == 'date':
+            return (datetime.date.fromordinal(v) if v is not None else None for v in _with_nulls(values, nulls))
+        return _with_nulls(values, nulls)
+    if encoding == 'float':
+        return _with_nulls(_array('f', part('values'), byteorder), _array('I', part('nulls'), byteorder))
+    if encoding == 'str':
+        return _decode_str(_array('I', part('lengths'), byteorder), part('blob'), _array('I', part('nulls'), byteorder))
+    dictionary = list(_decode_str(_array('I', part('dict_lengths'), byteorder), part('dict_blob'),
+                                  _array('I', part('dict_nulls'), byteorder)))
+    return (dictionary[code] for code in _array('I', part('codes'), byteorder))
+
+def primary_key(table):
+    return ", ".join(TABLE_COLUMNS[table][:PRIMARY_KEY_LENGTH[table]])
+
+def write_snapshot(path, tables):
+    """Write (table, rows) pairs, rows in primary-key order, to the snapshot at `path`. Returns {table: rows}."""
+    manifest = {'version': SNAPSHOT_VERSION, 'byteorder': sys.byteorder,
+                'exported_at': datetime.datetime.now().isoformat(timespec='seconds'), 'tables': {}}
+    tmp_path = path + ".tmp"
+    with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+        for table, table_rows in tables:
+            columns = TABLE_COLUMNS[table]
+            encodings = COLUMN_ENCODINGS[table]
+            builders = [new_column(encoding) for encoding in encodings]
+            rows = 0
+            for row in table_rows:
+                for builder, value in zip(builders, row):
+                    builder.append(value)
+                rows += 1
+            for column, builder in zip(columns, builders):
+                for name, data in builder.parts().items():
+                    zf.writestr(f"{table}/{column}/{name}", data)
+            manifest['tables'][table] = {'rows': rows, 'columns': dict(zip(columns, encodings))}
+            print(f"Exported {rows} rows from {table}.")
+        zf.writestr(MANIFEST, json.dumps(manifest, indent=2))
+    os.replace(tmp_path, path)
+    return {table: info['rows'] for table, info in manifest['tables'].items()}
+
+def _table_rows(conn, table):
+    # Unbuffered: rows stream into the column builders instead of being fetched all at once
+    cursor = conn.cursor(buffered=False)
+    try:
+        cursor.execute(f"SELECT {', '.join(TABLE_COLUMNS[table])} FROM {table} ORDER BY {primary_key(table)}")
+        yield from cursor
+    finally:
+        cursor.close()
+
+def export_snapshot(conn, path):
+    """Dump all seven tables to `path`. Returns {table: rows}."""
+    return write_snapshot(path, ((table, _table_rows(conn, table)) for table in FLUSH_ORDER))
+
+def read_snapshot(path):
+    """Yield (table, iterator of row tuples) in FK-safe order."""
+    with zipfile.ZipFile(path) as zf:
+        manifest = json.loads(zf.read(MANIFEST))
+        if manifest.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"{path} is snapshot version {manifest.get('version')}, expected {SNAPSHOT_VERSION}")
+        byteorder = manifest['byteorder']
+        for table in FLUSH_ORDER:
+            info = manifest['tables'][table]
+            iterators = []
+            for column, encoding in info['columns'].items():
+                prefix = f"{table}/{column}/"
+                iterators.append(decode_column(encoding, lambda name, prefix=prefix: zf.read(prefix + name), byteorder))
+            yield table, zip(*iterators)
+
+def _existing_tables(cursor):
+    cursor.execute("SELECT TABLE_NAME FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE()")
+    return {row[0] for row in cursor.fetchall()}
+
+def import_snapshot(path, replace=False):
+    """
+    Recreate the schema (dropping the current tables if `replace`), bulk-load the snapshot with
+    secondary indexes built after the data, and rebuild the summary tables. Returns rows loaded.
+    Freshly created tables start bare; the index migrations run once the rows are in.
+    """
+    conn = connect_direct(allow_local_infile=True)
+    try:
+        cursor = conn.cursor()
+        existing = _existing_tables(cursor)
+        if existing & set(FLUSH_ORDER) and not replace:
+            cursor.execute("SELECT COUNT(*) FROM Movies")
+            if cursor.fetchone()[0]:
+                print("The DB already holds movies. Re-run with --replace to drop and recreate every table.")
+                return 0
+        fresh = replace or not set(FLUSH_ORDER) <= existing
+        if replace:
+            cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+            for table in ['Schema_Migrations', 'Data_Version', 'Sync_State'] + list(aggregates.AGGREGATE_TABLES) + list(reversed(FLUSH_ORDER)):
+                cursor.execute(f"DROP TABLE IF EXISTS {table}")
+            cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+        if fresh:
+            create_database(defer_indexes=True)
+
+        loader = BulkLoader()
+        rows = 0
+        for table, table_rows in read_snapshot(path):
+            for row in table_rows:
+                loader.add(table, row)
+                rows += 1
+        # The snapshot was consistent when exported; skip per-row FK and unique checks during the load
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+        cursor.execute("SET UNIQUE_CHECKS = 0")
+        try:
+            # Existing tables still have their indexes; BulkLoader drops and rebuilds those itself
+            loader.load(conn, defer_indexes=not fresh)
+        finally:
+            cursor.execute("SET UNIQUE_CHECKS = 1")
+            cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+            loader.cleanup()
+        aggregates.rebuild(cursor)
+        bump_data_version(cursor)
+        conn.commit()
+        cursor.close()
+        if fresh:
+            migrate(conn)
+    finally:
+        conn.close()
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export / import the whole movie DB as a compressed columnar snapshot.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    export_cmd = sub.add_parser('export', help="Write all seven tables to a snapshot file")
+    export_cmd.add_argument('path')
+    import_cmd = sub.add_parser('import', help="Recreate the schema and load a snapshot")
+    import_cmd.add_argument('path')
+    import_cmd.add_argument('--replace', action='store_true', help="Drop the existing tables first")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        if args.command == 'export':
+            conn = connect_direct()
+            counts = export_snapshot(conn, args.path)
+            conn.close()
+            size_mb = os.path.getsize(args.path) / 1024 / 1024
+            print(f"Snapshot {args.path}: {sum(counts.values())} rows, {size_mb:.1f} MiB in {time.perf_counter() - start:.1f}s.")
+        else:
+            rows = import_snapshot(args.path, args.replace)
+            print(f"Imported {rows} rows in {time.perf_counter() - start:.1f}s.")
+    except (mysql.connector.Error, OSError, ValueError) as err:
+        print(f"Error: {err}")
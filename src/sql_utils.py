@@ -0,0 +1,11 @@
+# Helpers for the statements the scripts build by hand (IN (...) lists, batched id lookups)
+
+def placeholders(values):
+    """'%s, %s, ...' with one placeholder per item of `values`."""
+    return ", ".join(["%s"] * len(values))
+
+def chunks(items, size):
+    """`items` as consecutive lists of at most `size`, e.g. to keep IN (...) lists bounded."""
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
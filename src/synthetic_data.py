@@ -0,0 +1,161 @@
+import argparse
+import datetime
+import random
+import time
+import mysql.connector
+import aggregates
+from batch_writer import (BatchWriter, DEFAULT_BATCH_SIZE, FLUSH_ORDER, Genre, Movie, Actor, Producer,
+                          MovieGenre, MovieActor, MovieProducer)
+from bulk_load import BulkLoader
+from db_connection import connect_direct
+from mock_tmdb_server import GENRES
+from query_cache import bump_data_version
+
+# Generates a fake but realistically shaped catalog for the create_db_script schema:
+# long-tailed popularity, recent-skewed release dates, 1-4 genres and up to 10 billed
+# actors per movie drawn Zipf-style from a shared pool (so a few actors appear in
+# hundreds of movies), and first names like "Tom" that repeat across thousands of actors.
+
+# Relative frequency of each of the TMDB genres (Drama and Comedy dominate, as on TMDB)
+GENRE_WEIGHTS = [8, 5, 3, 12, 5, 4, 16, 3, 3, 2, 6, 2, 3, 6, 4, 2, 8, 1, 1]
+LANGUAGES = ['en', 'fr', 'es', 'ja', 'ko', 'de', 'it', 'hi', 'zh', 'ru', 'pt', 'sv']
+LANGUAGE_WEIGHTS = [60, 7, 6, 6, 4, 4, 3, 3, 3, 2, 1, 1]
+
+FIRST_NAMES = [
+    'Tom', 'John', 'Michael', 'David', 'James', 'Robert', 'Chris', 'Daniel', 'Mark', 'Paul',
+    'Emma', 'Olivia', 'Sarah', 'Anna', 'Maria', 'Laura', 'Julia', 'Kate', 'Lisa', 'Sophie',
+    'Jean', 'Pierre', 'Marie', 'Hiroshi', 'Yuki', 'Kenji', 'Min-jun', 'Ji-woo', 'Carlos', 'Lucia',
+    'Hans', 'Greta', 'Giovanni', 'Francesca', 'Raj', 'Priya', 'Wei', 'Mei', 'Ivan', 'Olga',
+]
+LAST_NAMES = [
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Miller', 'Davis', 'Wilson', 'Anderson', 'Taylor',
+    'Thomas', 'Moore', 'Martin', 'Jackson', 'White', 'Harris', 'Clark', 'Lewis', 'Walker', 'Hall',
+    'Hanks', 'Cruise', 'Hardy', 'Holland', 'Dubois', 'Moreau', 'Tanaka', 'Suzuki', 'Kim', 'Park',
+    'Garcia', 'Lopez', 'Muller', 'Schmidt', 'Rossi', 'Bianchi', 'Sharma', 'Patel', 'Wang', 'Ivanov',
+]
+TITLE_WORDS = [
+    'Star', 'Wars', 'Love', 'Night', 'Dark', 'Last', 'Lost', 'City', 'Dream', 'Blood',
+    'King', 'Queen', 'Return', 'Rise', 'Fall', 'Shadow', 'Light', 'Storm', 'Secret', 'Game',
+    'Heart', 'Fire', 'Ice', 'Man', 'Woman', 'Girl', 'Boy', 'House', 'Road', 'War',
+    'Ghost', 'Island', 'Summer', 'Winter', 'Empire', 'Legend', 'Hunter', 'Silent', 'Golden', 'Wild',
+]
+CAST_SIZE = 10 # The ingest keeps the top 10 billed actors
+
+def zipf_index(rng, n, offset=50):
+    """
+    Index in [0, n) with a long-tailed distribution (P(i) ~ 1/(i + offset)): low indexes are popular.
+    The offset flattens the head so the busiest actor is in a few percent of movies, not most of them.
+    """
+    return min(n - 1, int(offset * ((n + offset) / offset) ** rng.random()) - offset)
+
+def generate(movies, seed=42, actors=None):
+    """
+    Yield (table, record) pairs for a catalog of `movies` movies, parents before children per movie.
+    `actors` sets the actor pool (default 3 per movie); with it, half of the billing slots are drawn
+    uniformly, so the tail of a large pool is actually cast (--movies 400000 --actors 1200000
+    credits ~1M actors) instead of leaving most of it unused.
+    """
+    rng = random.Random(seed)
+    actor_pool = max(100, actors or movies * 3)
+    producer_pool = max(20, movies // 2)
+    seen_actors = set()
+    seen_producers = set()
+    genre_ids = [gid for gid, _ in GENRES]
+    start_date = datetime.date(1920, 1, 1)
+    span_days = (datetime.date(2025, 12, 31) - start_date).days
+
+    for gid, name in GENRES:
+        yield 'Genres', Genre(gid, name)
+
+    for movie_id in range(1, movies + 1):
+        title_len = rng.choice((1, 2, 2, 3, 3, 4))
+        title = " ".join(rng.choice(TITLE_WORDS) for _ in range(title_len))
+        if rng.random() < 0.08:
+            title += f" {rng.randint(2, 6)}"
+        # sqrt of a uniform skews dates towards the present
+        release_date = start_date + datetime.timedelta(days=int(span_days * rng.random() ** 0.5))
+        popularity = round(rng.paretovariate(1.5), 3)
+        vote_average = round(min(10.0, max(0.0, rng.gauss(6.4, 1.2))), 1)
+        vote_count = int(rng.paretovariate(1.2) * 10)
+        language = rng.choices(LANGUAGES, LANGUAGE_WEIGHTS)[0]
+        yield 'Movies', Movie(movie_id, title, release_date.isoformat(), popularity, vote_average, vote_count,
+                              f"Synthetic overview for {title}.", language)
+
+        n_genres = min(4, 1 + int(rng.expovariate(1.2)))
+        for genre_id in set(rng.choices(genre_ids, GENRE_WEIGHTS, k=n_genres)):
+            yield 'Movie_Genres', MovieGenre(movie_id, genre_id)
+
+        for billing in range(rng.randint(CAST_SIZE // 2, CAST_SIZE)):
+            if actors and rng.random() < 0.5:
+                index = rng.randrange(actor_pool)
+            else:
+                index = zipf_index(rng, actor_pool)
+            actor_id = 1000000 + index
+            if actor_id not in seen_actors:
+                seen_actors.add(actor_id)
+                name = f"{FIRST_NAMES[index % len(FIRST_NAMES)]} {LAST_NAMES[(index // len(FIRST_NAMES)) % len(LAST_NAMES)]}"
+                if index >= len(FIRST_NAMES) * len(LAST_NAMES):
+                    name += f" {index // (len(FIRST_NAMES) * len(LAST_NAMES))}"
+                yield 'Actors', Actor(actor_id, name, index % 3)
+            yield 'Movie_Actors', MovieActor(movie_id, actor_id, f"Character {billing + 1}")
+
+        for _ in range(rng.randint(0, 4)):
+            index = zipf_index(rng, producer_pool)
+            producer_id = 5000000 + index
+            if producer_id not in seen_producers:
+                seen_producers.add(producer_id)
+                yield 'Producers', Producer(producer_id, f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} Productions")
+            yield 'Movie_Producers', MovieProducer(movie_id, producer_id)
+
+def reset_tables(conn):
+    """Empty every table, summary tables included."""
+    cursor = conn.cursor()
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+    for table in list(aggregates.AGGREGATE_TABLES) + list(reversed(FLUSH_ORDER)):
+        try:
+            cursor.execute(f"TRUNCATE TABLE {table}")
+        except mysql.connector.Error as err:
+            print(f"Warning: could not truncate {table}: {err}")
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+    cursor.close()
+
+def populate(movies, seed=42, bulk=True, batch_size=DEFAULT_BATCH_SIZE, actors=None):
+    """Load a synthetic catalog into the (empty) DB and rebuild the summary tables. Returns rows written."""
+    conn = connect_direct(allow_local_infile=True)
+    try:
+        cursor = conn.cursor()
+        writer = BulkLoader() if bulk else BatchWriter(cursor, batch_size)
+        rows = 0
+        for table, record in generate(movies, seed, actors):
+            writer.add(table, record)
+            rows += 1
+        if bulk:
+            writer.load(conn)
+            writer.cleanup()
+        else:
+            writer.flush()
+        aggregates.rebuild(cursor)
+        bump_data_version(cursor)
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill the movie DB with a synthetic catalog for benchmarking.")
+    parser.add_argument('--movies', type=int, default=10000, help="Catalog size, e.g. 10000 / 100000 / 1000000")
+    parser.add_argument('--actors', type=int, help="Actor pool size (default 3 per movie), e.g. 1200000 for ~1M credited actors")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--insert', action='store_true', help="Use batched INSERT IGNORE instead of LOAD DATA")
+    parser.add_argument('--reset-tables', action='store_true', help="Empty all tables first (required)")
+    args = parser.parse_args()
+    if not args.reset_tables:
+        print("This replaces the whole catalog. Re-run with --reset-tables to confirm.")
+    else:
+        conn = connect_direct()
+        reset_tables(conn)
+        conn.close()
+        start = time.perf_counter()
+        rows = populate(args.movies, args.seed, bulk=not args.insert, actors=args.actors)
+        print(f"Generated {args.movies} movies ({rows} rows) in {time.perf_counter() - start:.1f}s.")
@@ -0,0 +1,124 @@
+import os
+import random
+import re
+import requests
+import time
+from email.utils import parsedate_to_datetime
+import instrumentation
+from rate_limiter import AdaptiveRateLimiter
+
+MAX_RETRIES = int(os.getenv('TMDB_MAX_RETRIES', 5))
+BACKOFF_BASE = 1.0 # Seconds before the first retry
+BACKOFF_CAP = 60.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# (connect, read) seconds; a stalled request then raises and goes through the retries
+HTTP_TIMEOUT = (float(os.getenv('TMDB_CONNECT_TIMEOUT', 5)), float(os.getenv('TMDB_READ_TIMEOUT', 30)))
+_ID_SEGMENT = re.compile(r'/\d+')
+
+def backoff_delay(attempt):
+    """Exponential backoff with full jitter for the given retry attempt (0-based)."""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+def endpoint_label(path):
+    """'/movie/550/credits' -> '/movie/{id}/credits', so profiles group by endpoint."""
+    return _ID_SEGMENT.sub('/{id}', path)
+
+def parse_retry_after(value):
+    """Retry-After is either a number of seconds or an HTTP date. Returns seconds, or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class TMDBClient:
+    """
+    Thin wrapper around the TMDB v3 API used by the ingest scripts.
+    Handles auth (API key vs. read access token), the optional response cache, and
+    rate limiting: every request goes through one shared AdaptiveRateLimiter, and
+    429s / 5xx / connection errors / timeouts are retried up to `max_retries` times.
+    Requests share one keep-alive session, so the TLS handshake is paid once per connection.
+    """
+
+    def __init__(self, api_key, base_url, cache=None, limiter=None, max_retries=MAX_RETRIES, timeout=HTTP_TIMEOUT):
+        self.base_url = base_url
+        self.session = requests.Session()
+        self.timeout = timeout
+        self.cache = cache
+        self.limiter = limiter if limiter is not None else AdaptiveRateLimiter()
+        self.max_retries = max_retries
+        self.requests = 0 # HTTP requests sent, retries included
+        self.retries = 0
+        # Auth headers logic
+        self.params = {}
+        if len(api_key) > 40: # Read Access Token
+            self.headers = {
+                "accept": "application/json",
+                "Authorization": f"Bearer {api_key}"
+            }
+        else: # API API Key
+            self.params['api_key'] = api_key
+            self.headers = {"accept": "application/json"}
+
+    def get(self, path, **params):
+        """
+        GET `path` (e.g. '/movie/550/credits').
+        Returns (status_code, payload): the decoded JSON on 200, the response text otherwise.
+        A 429 is only returned once the retries are exhausted.
+        """
+        url = f"{self.base_url}{path}"
+        p = self.params.copy()
+        p.update(params)
+
+        label = endpoint_label(path)
+        if self.cache is not None:
+            with instrumentation.timed('cache', label):
+                payload = self.cache.get(url, p)
+            if payload is not None:
+                instrumentation.count('cache', f"hit {label}")
+                return 200, payload
+
+        response = self._request(url, p, label)
+        if response.status_code != 200:
+            return response.status_code, response.text
+
+        with instrumentation.timed('json', label):
+            payload = response.json()
+        if self.cache is not None:
+            self.cache.put(url, p, payload)
+        return 200, payload
+
+    def _request(self, url, params, label):
+        attempt = 0
+        while True:
+            with instrumentation.timed('ratelimit', label):
+                self.limiter.acquire()
+            self.requests += 1
+            try:
+                with instrumentation.timed('http', label):
+                    response = self.session.get(url, headers=self.headers, params=params, timeout=self.timeout)
+            except requests.RequestException:
+                if attempt >= self.max_retries:
+                    raise
+                response = None
+
+            if response is not None and response.status_code not in RETRY_STATUSES:
+                self.limiter.on_success()
+                return response
+            if response is not None and attempt >= self.max_retries:
+                return response
+
+            delay = backoff_delay(attempt)
+            if response is not None and response.status_code == 429:
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                self.limiter.on_throttle(retry_after)
+                delay = max(delay, retry_after or 0)
+            self.retries += 1
+            instrumentation.count('http', f"retry {label}")
+            attempt += 1
+            time.sleep(delay)